@@ -23,13 +23,19 @@ SYSTEM_PATH = brokkr.utils.misc.get_system_path(SYSTEMPATH_CONFIG)
 WEBSITE_CONFIG_PATH = SYSTEM_PATH / WEBSITE_CONFIG_SUBDIR
 
 
-def load_website_config(
-        dashboard=None, dashboard_dir=WEBSITE_CONFIG_PATH, mode=None):
-    # Set up path to selected dashboard
+def get_website_config_path(dashboard=None, dashboard_dir=WEBSITE_CONFIG_PATH):
     dashboard = dashboard or DEFAULT_DASHBOARD
     dashboard_path = Path(dashboard_dir) / dashboard
     if not dashboard_path.suffix:
         dashboard_path = dashboard_path.with_suffix(DASHBOARD_SUFFIX)
+    return dashboard_path
+
+
+def load_website_config(
+        dashboard=None, dashboard_dir=WEBSITE_CONFIG_PATH, mode=None):
+    # Set up path to selected dashboard
+    dashboard_path = get_website_config_path(
+        dashboard=dashboard, dashboard_dir=dashboard_dir)
 
     # Set up namespace
     dashboard_config = {}
@@ -43,6 +49,8 @@ def load_website_config(
     return dashboard_config
 
 
+WEBSITE_CONFIG_FILE_PATH = get_website_config_path()
+_website_config_mtime_ns = WEBSITE_CONFIG_FILE_PATH.stat().st_mtime_ns
 _website_config = load_website_config()
 
 
@@ -50,29 +58,95 @@ _website_config = load_website_config()
 
 DATA_DIR_CLIENT = _website_config["DATA_DIR_CLIENT"]
 GLOB_PATTERN_CLIENT = _website_config["GLOB_PATTERN_CLIENT"]
+CSV_ENGINE_CLIENT = _website_config.get("CSV_ENGINE_CLIENT", None)
 
 DATA_DIR_SERVER = _website_config["DATA_DIR_SERVER"]
 UNIT_DIRS_SERVER = _website_config["UNIT_DIRS_SERVER"]
 DATA_SUBDIR_SERVER = _website_config["DATA_SUBDIR_SERVER"]
 GLOB_PATTERN_SERVER = _website_config["GLOB_PATTERN_SERVER"]
+CSV_ENGINE_SERVER = _website_config.get("CSV_ENGINE_SERVER", None)
 
 OUTPUT_DIR_SERVER = _website_config["OUTPUT_DIR_SERVER"]
 OUTPUT_TARGET_CLIENT = _website_config.get("OUTPUT_TARGET_CLIENT", None)
+OUTPUT_COMPRESSION = _website_config.get("OUTPUT_COMPRESSION", ())
+BUILD_DATA_FAST_PATH = _website_config.get("BUILD_DATA_FAST_PATH", False)
+SYNC_OUTPUT = _website_config.get("SYNC_OUTPUT", False)
+SYNC_COMPARE_HASH = _website_config.get("SYNC_COMPARE_HASH", False)
+SYNC_LINK = _website_config.get("SYNC_LINK", None)
+SYNC_DELETE = _website_config.get("SYNC_DELETE", False)
+SYNC_WORKERS = _website_config.get("SYNC_WORKERS", None)
+LEKTOR_IN_PROCESS = _website_config.get("LEKTOR_IN_PROCESS", False)
 
 
 DATETIME_COLNAME = _website_config.get("DATETIME_COLNAME", "time")
 DATETIME_FORMAT = _website_config.get(
     "DATETIME_FORMAT", "%Y-%m-%d %H:%M:%S.%f")
 
+FILENAME_DATE_PATTERN = _website_config.get(
+    "FILENAME_DATE_PATTERN", r"(\d{4})-?(\d{2})-?(\d{2})")
+
 CALCULATED_COLUMNS = _website_config.get("CALCULATED_COLUMNS", ())
+CALCULATED_COLUMNS_SERVER = _website_config.get(
+    "CALCULATED_COLUMNS_SERVER", ())
+CALCULATED_COLUMNS_WORKERS = _website_config.get(
+    "CALCULATED_COLUMNS_WORKERS", None)
+
+CSV_DTYPES = _website_config.get("CSV_DTYPES", None)
+REPORT_PARSE_THROUGHPUT = _website_config.get("REPORT_PARSE_THROUGHPUT", False)
+
+INGEST_INCREMENTAL = _website_config.get("INGEST_INCREMENTAL", False)
+INGEST_DISK_CACHE = _website_config.get("INGEST_DISK_CACHE", False)
+INGEST_RING_BUFFER = _website_config.get("INGEST_RING_BUFFER", False)
+INGEST_PROJECT_COLUMNS = _website_config.get("INGEST_PROJECT_COLUMNS", False)
+INGEST_STREAMING_THRESHOLD_MB = _website_config.get(
+    "INGEST_STREAMING_THRESHOLD_MB", None)
+INGEST_STREAMING_CHUNK_ROWS = _website_config.get(
+    "INGEST_STREAMING_CHUNK_ROWS", 100000)
+INGEST_STREAMING_DECIMATE = _website_config.get(
+    "INGEST_STREAMING_DECIMATE", None)
+INGEST_MEMORY_LIMIT_MB = _website_config.get("INGEST_MEMORY_LIMIT_MB", None)
+INGEST_EXECUTOR_SERVER = _website_config.get("INGEST_EXECUTOR_SERVER", None)
+INGEST_WORKERS_SERVER = _website_config.get("INGEST_WORKERS_SERVER", None)
+
+COMPACT_FLOAT_DTYPE = _website_config.get("COMPACT_FLOAT_DTYPE", None)
+COMPACT_INTEGERS = _website_config.get("COMPACT_INTEGERS", False)
+COMPACT_CATEGORICAL_COLUMNS = _website_config.get(
+    "COMPACT_CATEGORICAL_COLUMNS", ())
+COMPACT_DATETIME_INDEX = _website_config.get("COMPACT_DATETIME_INDEX", False)
+REPORT_MEMORY_USAGE = _website_config.get("REPORT_MEMORY_USAGE", False)
+DASHBOARD_ROLLING_AGGREGATES = _website_config.get(
+    "DASHBOARD_ROLLING_AGGREGATES", False)
+REPORT_DATA_CACHE_STATS = _website_config.get("REPORT_DATA_CACHE_STATS", False)
+WATCH_WEBSITE_CONFIG = _website_config.get("WATCH_WEBSITE_CONFIG", False)
+WATCH_DATA_DIRS = _website_config.get("WATCH_DATA_DIRS", False)
+WATCH_DEBOUNCE_S = _website_config.get("WATCH_DEBOUNCE_S", 1)
+WATCH_POLL_INTERVAL_S = _website_config.get("WATCH_POLL_INTERVAL_S", 1)
 
 
 CONTENT_PAGES_CLIENT = copy.deepcopy(_website_config["CONTENT_PAGES_CLIENT"])
 CONTENT_PAGES_SERVER = copy.deepcopy(_website_config["CONTENT_PAGES_SERVER"])
 
 
-def get_content_config(mode):
+def get_content_config(mode, deepcopy=True):
     if mode in {"test", "client"}:
-        return copy.deepcopy(CONTENT_PAGES_CLIENT)
+        content_pages = CONTENT_PAGES_CLIENT
     else:
-        return copy.deepcopy(CONTENT_PAGES_SERVER)
+        content_pages = CONTENT_PAGES_SERVER
+    if deepcopy:
+        return copy.deepcopy(content_pages)
+    return content_pages
+
+
+def reload_content_config():
+    # Reload the content pages if the config file changed since last loaded
+    # Other settings are only read at startup
+    global CONTENT_PAGES_CLIENT, CONTENT_PAGES_SERVER, _website_config_mtime_ns
+    config_mtime_ns = WEBSITE_CONFIG_FILE_PATH.stat().st_mtime_ns
+    if config_mtime_ns == _website_config_mtime_ns:
+        return False
+    _website_config_mtime_ns = config_mtime_ns
+
+    website_config = load_website_config()
+    CONTENT_PAGES_CLIENT = copy.deepcopy(website_config["CONTENT_PAGES_CLIENT"])
+    CONTENT_PAGES_SERVER = copy.deepcopy(website_config["CONTENT_PAGES_SERVER"])
+    return True
@@ -4,30 +4,166 @@ Data ingest and processing code for Mjolnir (and other) data.
 """
 
 # Standard library imports
+import bisect
+import concurrent.futures
+import datetime
+import functools
+import hashlib
+import io
+import os
 from pathlib import Path
+import re
+import threading
+import time
 
 # Third party imports
 import importlib_metadata
+import numpy as np
 import packaging.version
 import pandas as pd
 
 # Local imports
 from sindri.config.website import (
     CALCULATED_COLUMNS,
+    CALCULATED_COLUMNS_SERVER,
+    CALCULATED_COLUMNS_WORKERS,
+    COMPACT_CATEGORICAL_COLUMNS,
+    COMPACT_DATETIME_INDEX,
+    COMPACT_FLOAT_DTYPE,
+    COMPACT_INTEGERS,
+    CSV_DTYPES,
+    CSV_ENGINE_CLIENT,
+    CSV_ENGINE_SERVER,
     DATA_DIR_CLIENT,
     DATA_DIR_SERVER,
     DATA_SUBDIR_SERVER,
     DATETIME_COLNAME,
     DATETIME_FORMAT,
+    FILENAME_DATE_PATTERN,
     GLOB_PATTERN_CLIENT,
     GLOB_PATTERN_SERVER,
+    INGEST_DISK_CACHE,
+    INGEST_EXECUTOR_SERVER,
+    INGEST_INCREMENTAL,
+    INGEST_MEMORY_LIMIT_MB,
+    INGEST_RING_BUFFER,
+    INGEST_STREAMING_CHUNK_ROWS,
+    INGEST_STREAMING_DECIMATE,
+    INGEST_STREAMING_THRESHOLD_MB,
+    INGEST_WORKERS_SERVER,
+    REPORT_MEMORY_USAGE,
+    REPORT_PARSE_THROUGHPUT,
     UNIT_DIRS_SERVER,
     )
 import sindri.utils.misc
+import sindri.utils.ringbuffer
 
 
 FIGSIZE_DEFAULT = (8, 24)
 
+STATUS_CACHE_SUBDIR = "status_data"
+
+FAST_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+FAST_DATETIME_TEMPLATE = b"0000-00-00 00:00:00.000000"
+FAST_DATETIME_ROW_BYTES = 32
+FAST_DATETIME_BLOCK_ROWS = 8192
+
+CSV_ENGINES = {"c", "python", "pyarrow"}
+
+INGEST_EXECUTOR_CLASSES = {
+    "thread": concurrent.futures.ThreadPoolExecutor,
+    "process": concurrent.futures.ProcessPoolExecutor,
+    }
+
+# Sorted, date-indexed listings of data files, keyed by directory and glob
+_STATUS_FILE_CATALOGS = {}
+
+# Per-file ingest state for incremental loading, keyed by file path
+_STATUS_FILE_CACHE = {}
+
+# Most recent parse throughput statistics, keyed by source name
+PARSE_STATS = {}
+
+# Ring buffers and the files they've ingested, keyed by data directory
+_STATUS_DATA_BUFFERS = {}
+
+# Worker pools for parallel ingest, kept alive across update cycles
+_INGEST_EXECUTORS = {}
+_INGEST_EXECUTORS_LOCK = threading.Lock()
+
+# Worker pools for calculating independent columns concurrently
+_CALCULATION_EXECUTORS = {}
+
+
+def get_filename_date(path, date_pattern=FILENAME_DATE_PATTERN):
+    match = re.search(date_pattern, Path(path).name)
+    if match is None:
+        return None
+    try:
+        return datetime.date(*(int(group) for group in match.groups()[:3]))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_status_file_catalog(
+        data_dir=DATA_DIR_CLIENT,
+        glob_pattern=GLOB_PATTERN_CLIENT,
+        date_pattern=FILENAME_DATE_PATTERN,
+        catalogs=_STATUS_FILE_CATALOGS,
+        ):
+    data_dir = Path(data_dir)
+    try:
+        dir_mtime = data_dir.stat().st_mtime_ns
+    except FileNotFoundError:
+        dir_mtime = None
+
+    # Directory mtime only tracks direct children, so skip recursive globs
+    cacheable = dir_mtime is not None and "/" not in glob_pattern and (
+        "**" not in glob_pattern)
+    catalog_key = (data_dir.as_posix(), glob_pattern, date_pattern)
+    catalog = catalogs.get(catalog_key, None)
+    if cacheable and catalog and catalog["dir_mtime"] == dir_mtime:
+        return catalog
+
+    paths = sorted(data_dir.glob(glob_pattern))
+    dates = [get_filename_date(path, date_pattern=date_pattern)
+             for path in paths]
+    catalog = {"dir_mtime": dir_mtime, "paths": paths, "dates": None}
+    # Only index by date if every file has one; otherwise go by position
+    if paths and all(date is not None for date in dates):
+        dated_paths = sorted(zip(dates, paths))
+        catalog["dates"] = [date for date, __ in dated_paths]
+        catalog["paths"] = [path for __, path in dated_paths]
+    if cacheable:
+        catalogs[catalog_key] = catalog
+    return catalog
+
+
+def get_status_data_paths_range(
+        start_date=None,
+        end_date=None,
+        data_dir=DATA_DIR_CLIENT,
+        glob_pattern=GLOB_PATTERN_CLIENT,
+        catalog=None,
+        ):
+    # Get the files dated within [start_date, end_date], inclusive
+    if catalog is None:
+        catalog = get_status_file_catalog(
+            data_dir=data_dir, glob_pattern=glob_pattern)
+    if catalog["dates"] is None:
+        raise ValueError(
+            f"Not all files matching {glob_pattern!r} in "
+            f"{Path(data_dir).as_posix()!r} have a date in their filename")
+    start_idx = 0
+    end_idx = len(catalog["dates"])
+    if start_date is not None:
+        start_idx = bisect.bisect_left(
+            catalog["dates"], pd.Timestamp(start_date).date())
+    if end_date is not None:
+        end_idx = bisect.bisect_right(
+            catalog["dates"], pd.Timestamp(end_date).date())
+    return catalog["paths"][start_idx:end_idx]
+
 
 def get_status_data_paths(
         n_days=None,
@@ -35,13 +171,23 @@ def get_status_data_paths(
         data_dir=DATA_DIR_CLIENT,
         glob_pattern=GLOB_PATTERN_CLIENT,
         ):
+    catalog = get_status_file_catalog(
+        data_dir=data_dir, glob_pattern=glob_pattern)
+    files_to_load = list(catalog["paths"])
+    if n_days is None or not files_to_load:
+        return files_to_load
 
-    files_to_load = sorted(list(Path(data_dir).glob(glob_pattern)))
-    if n_days is not None:
-        if lag:
-            files_to_load = files_to_load[(-1 * n_days - lag):(lag * -1)]
-        else:
-            files_to_load = files_to_load[-1 * n_days:]
+    # Select by date relative to the newest file, so gaps don't pull in
+    # older days; fall back to position if files aren't all dated
+    if catalog["dates"] is not None:
+        end_date = catalog["dates"][-1] - datetime.timedelta(days=lag or 0)
+        start_date = end_date - datetime.timedelta(days=n_days - 1)
+        return get_status_data_paths_range(
+            start_date, end_date, glob_pattern=glob_pattern, catalog=catalog)
+    if lag:
+        files_to_load = files_to_load[(-1 * n_days - lag):(lag * -1)]
+    else:
+        files_to_load = files_to_load[-1 * n_days:]
     return files_to_load
 
 
@@ -71,26 +217,499 @@ def get_all_status_data_subpaths(**path_kwargs):
     return sorted([path for paths in paths_bykey.values() for path in paths])
 
 
-def load_status_data(n_days=None, lag=None, data_dir=DATA_DIR_CLIENT,
-                     glob_pattern=GLOB_PATTERN_CLIENT):
-    files_to_load = get_status_data_paths(
-        n_days=n_days, lag=lag, data_dir=data_dir, glob_pattern=glob_pattern)
+class ColumnSelection(frozenset):
+    # Set of column names to parse, usable as a callable read_csv usecols
+    # (unlike a list, it doesn't fail on files missing some of them)
+    def __call__(self, colname):
+        return colname in self
+
 
+def _get_bad_lines_kwargs():
     pandas_ver = packaging.version.parse(importlib_metadata.version("pandas"))
     if pandas_ver < packaging.version.parse("1.3.0"):
-        read_csv_kwargs = {"error_bad_lines": False, "warn_bad_lines": True}
+        return {"error_bad_lines": False, "warn_bad_lines": True}
+    return {"on_bad_lines": "warn"}
+
+
+@functools.lru_cache(maxsize=None)
+def is_pyarrow_engine_available():
+    pandas_ver = packaging.version.parse(importlib_metadata.version("pandas"))
+    if pandas_ver < packaging.version.parse("1.4.0"):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def get_csv_engine(engine=CSV_ENGINE_CLIENT):
+    # Cached so the fallback notice is only printed once per engine
+    if engine is not None and engine not in CSV_ENGINES:
+        raise ValueError(
+            f"CSV engine must be one of {{None, {', '.join(CSV_ENGINES)}}}, "
+            f"not {engine!r}")
+    if engine == "pyarrow" and not is_pyarrow_engine_available():
+        print("Pyarrow CSV engine requires pyarrow and pandas >= 1.4; "
+              "falling back to default engine")
+        return None
+    return engine
+
+
+def get_read_csv_kwargs(
+        engine=CSV_ENGINE_CLIENT, dtypes=CSV_DTYPES, usecols=None):
+    engine = get_csv_engine(engine)
+
+    # The pyarrow engine doesn't support skipping bad lines on pandas < 2
+    if engine == "pyarrow":
+        read_csv_kwargs = {"engine": engine}
     else:
-        read_csv_kwargs = {"on_bad_lines": "warn"}
+        read_csv_kwargs = _get_bad_lines_kwargs()
+        if engine:
+            read_csv_kwargs["engine"] = engine
+    if usecols is not None:
+        usecols = ColumnSelection(usecols)
+        read_csv_kwargs["usecols"] = usecols
+    if dtypes:
+        read_csv_kwargs["dtype"] = {
+            colname: dtype for colname, dtype in dict(dtypes).items()
+            if usecols is None or colname in usecols}
+    return read_csv_kwargs
+
+
+def read_status_csv(source, source_name=None,
+                    report_throughput=REPORT_PARSE_THROUGHPUT,
+                    **read_csv_kwargs):
+    if source_name is None:
+        source_name = Path(source).as_posix()
+    engine = read_csv_kwargs.get("engine", "c")
+    # Pyarrow requires all usecols to exist, so select columns after parsing
+    usecols = read_csv_kwargs.get("usecols", None)
+    if engine == "pyarrow" and callable(usecols):
+        read_csv_kwargs = {
+            key: value for key, value in read_csv_kwargs.items()
+            if key != "usecols"}
+
+    start_time = time.perf_counter()
+    try:
+        status_data = pd.read_csv(source, **read_csv_kwargs)
+    except Exception as error:
+        if engine != "pyarrow":
+            raise
+        print(f"Error parsing {source_name!r} with pyarrow engine; "
+              "retrying with default engine")
+        print(f"{type(error).__name__}: {error}")
+        if hasattr(source, "seek"):
+            source.seek(0)
+        read_csv_kwargs = {
+            **{key: value for key, value in read_csv_kwargs.items()
+               if key != "engine"},
+            **_get_bad_lines_kwargs(),
+            }
+        engine = "c"
+        status_data = pd.read_csv(source, **read_csv_kwargs)
+    if callable(usecols) and not all(map(usecols, status_data.columns)):
+        status_data = status_data[
+            [colname for colname in status_data.columns if usecols(colname)]]
+    parse_time = time.perf_counter() - start_time
+
+    if hasattr(source, "getbuffer"):
+        n_bytes = source.getbuffer().nbytes
+    else:
+        n_bytes = Path(source).stat().st_size
+    PARSE_STATS[source_name] = {
+        "engine": engine,
+        "n_bytes": n_bytes,
+        "n_rows": len(status_data),
+        "parse_time_s": parse_time,
+        }
+    if report_throughput:
+        print(f"Parsed {source_name!r} with {engine} engine: "
+              f"{n_bytes / 1e6:.2f} MB, {len(status_data)} rows in "
+              f"{parse_time * 1000:.1f} ms "
+              f"({n_bytes / 1e6 / max(parse_time, 1e-9):.1f} MB/s)")
+    return status_data
+
+
+def _check_file_header(path, header):
+    with open(path, "rb") as status_file:
+        return status_file.read(len(header)) == header
+
+
+def read_status_file_incremental(
+        path, read_csv_kwargs=None, file_cache=_STATUS_FILE_CACHE,
+        keep_data=True):
+    # Returns the file's full data, the newly parsed rows and if it was reset
+    # If not keep_data, only the columns are kept, and the full data is only
+    # returned if the file was (re)read from the start
+    if read_csv_kwargs is None:
+        read_csv_kwargs = get_read_csv_kwargs()
+    path = Path(path)
+    cache_key = path.as_posix()
+    file_stat = path.stat()
+    file_state = file_cache.get(cache_key, None)
+
+    # Re-read from the start if the selected columns changed
+    if file_state is not None and file_state["usecols"] != (
+            read_csv_kwargs.get("usecols", None)):
+        file_state = None
+
+    if file_state is not None:
+        if (file_state["inode"] == file_stat.st_ino
+                and file_state["size"] == file_stat.st_size
+                and file_state["mtime_ns"] == file_stat.st_mtime_ns):
+            return file_state["data"], file_state["data"].iloc[0:0], False
+        # Re-read the whole file if it was rotated, truncated or rewritten
+        if (file_state["inode"] != file_stat.st_ino
+                or file_stat.st_size < file_state["offset"]
+                or file_stat.st_mtime_ns < file_state["mtime_ns"]
+                or not _check_file_header(path, file_state["header"])):
+            file_state = None
+
+    if file_state is None:
+        with open(path, "rb") as status_file:
+            file_content = status_file.read()
+        end_offset = file_content.rfind(b"\n") + 1
+        # Don't cache files without a complete header line yet
+        if not end_offset:
+            file_cache.pop(cache_key, None)
+            status_data = read_status_csv(
+                io.BytesIO(file_content), source_name=cache_key,
+                **read_csv_kwargs)
+            return status_data, status_data, True
+        status_data = read_status_csv(
+            io.BytesIO(file_content[:end_offset]), source_name=cache_key,
+            **read_csv_kwargs)
+        new_data = status_data
+        header = file_content[:file_content.find(b"\n") + 1]
+        file_state = {
+            "header": header,
+            "names": list(pd.read_csv(io.BytesIO(header), nrows=0).columns),
+            "offset": end_offset,
+            "usecols": read_csv_kwargs.get("usecols", None),
+            }
+        was_reset = True
+    else:
+        with open(path, "rb") as status_file:
+            status_file.seek(file_state["offset"])
+            file_content = status_file.read()
+        # Only consume complete lines; partial ones are read next time
+        end_offset = file_content.rfind(b"\n") + 1
+        if end_offset:
+            new_data = read_status_csv(
+                io.BytesIO(file_content[:end_offset]),
+                source_name=cache_key,
+                header=None,
+                names=file_state["names"],
+                **read_csv_kwargs,
+                )
+            status_data = pd.concat(
+                (file_state["data"], new_data), ignore_index=True, sort=False)
+            file_state["offset"] += end_offset
+        else:
+            new_data = file_state["data"].iloc[0:0]
+            status_data = file_state["data"]
+        was_reset = False
+
+    file_state.update({
+        "data": status_data if keep_data else status_data.iloc[0:0],
+        "inode": file_stat.st_ino,
+        "mtime_ns": file_stat.st_mtime_ns,
+        "size": file_stat.st_size,
+        })
+    file_cache[cache_key] = file_state
+    return status_data, new_data, was_reset
+
+
+def read_status_file_processed(
+        path, column_specs=CALCULATED_COLUMNS, file_cache=_STATUS_FILE_CACHE,
+        **read_csv_kwargs):
+    # Preprocess only the newly read rows and append them to the cached
+    # processed data; treat the returned data as read-only
+    cache_key = Path(path).as_posix()
+    specs_key = _get_column_specs_key(column_specs)
+    file_state = file_cache.get(cache_key, None)
+    # Re-read from the start if rows were read without being processed
+    # (e.g. by the ring buffer) or with other calculated columns
+    if file_state is not None and (
+            file_state.get("processed", None) is None
+            or file_state.get("processed_offset", None)
+            != file_state["offset"]
+            or file_state.get("processed_specs", None) != specs_key):
+        del file_cache[cache_key]
+    __, new_data, was_reset = read_status_file_incremental(
+        path, read_csv_kwargs=read_csv_kwargs, file_cache=file_cache,
+        keep_data=False)
+    file_state = file_cache.get(cache_key, {})
+    processed_data = file_state.get("processed", None)
+    if was_reset or processed_data is None:
+        processed_data = preprocess_status_file(
+            new_data, column_specs=column_specs)
+    elif len(new_data):
+        processed_data = pd.concat(
+            (processed_data,
+             preprocess_status_file(new_data, column_specs=column_specs)),
+            ignore_index=True,
+            sort=False,
+            )
+    if file_state:
+        file_state.update({
+            "processed": processed_data,
+            "processed_offset": file_state["offset"],
+            "processed_specs": specs_key,
+            })
+    return processed_data
+
+
+def evict_status_file_cache(
+        data_dir, keep_paths, file_cache=_STATUS_FILE_CACHE):
+    data_dir = Path(data_dir).as_posix()
+    keep_keys = {Path(path).as_posix() for path in keep_paths}
+    for cache_key in list(file_cache.keys()):
+        if (Path(cache_key).parent.as_posix() == data_dir
+                and cache_key not in keep_keys):
+            del file_cache[cache_key]
+
+
+def _get_column_specs_key(column_specs):
+    # Fingerprint the per-file calculated columns so cached files track code
+    # changes
+    key_parts = []
+    for column_spec in get_row_wise_specs(column_specs):
+        colname, after_col, col_function, __, __ = _unpack_column_spec(
+            column_spec)
+        col_code = getattr(col_function, "__code__", None)
+        if col_code is None:
+            col_key = repr(col_function)
+        else:
+            col_key = (col_code.co_code, col_code.co_consts, col_code.co_names)
+        key_parts.append(repr((colname, after_col, col_key)))
+    return "\n".join(key_parts).encode()
+
+
+def _get_cache_format():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "pickle"
+    return "feather"
+
+
+def get_status_cache_path(path, column_specs=(), usecols=None, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = sindri.utils.misc.get_cache_dir() / STATUS_CACHE_SUBDIR
+    path = Path(path).resolve()
+    file_stat = path.stat()
+    path_hash = hashlib.sha1(path.as_posix().encode()).hexdigest()
+    usecols_key = "" if usecols is None else repr(sorted(usecols))
+    version_hash = hashlib.sha1(
+        f"{file_stat.st_size}|{file_stat.st_mtime_ns}|{usecols_key}|".encode()
+        + _get_column_specs_key(column_specs)).hexdigest()
+    return Path(cache_dir) / f"{path_hash}_{version_hash[:16]}"
+
+
+def read_status_cache(cache_path):
+    for cache_format in ("feather", "pickle"):
+        cache_file = cache_path.with_suffix(f".{cache_format}")
+        if not cache_file.exists():
+            continue
+        if cache_format == "feather":
+            return pd.read_feather(cache_file)
+        return pd.read_pickle(cache_file)
+    return None
+
+
+def write_status_cache(status_data, cache_path):
+    os.makedirs(cache_path.parent, exist_ok=True)
+    path_hash = cache_path.name.split("_")[0]
+    for stale_path in cache_path.parent.glob(f"{path_hash}_*"):
+        stale_path.unlink()
+
+    cache_format = _get_cache_format()
+    cache_file = cache_path.with_suffix(f".{cache_format}")
+    temp_file = cache_file.with_suffix(".tmp")
+    if cache_format == "feather":
+        status_data.reset_index(drop=True).to_feather(temp_file)
+    else:
+        status_data.to_pickle(temp_file)
+    os.replace(temp_file, cache_file)
+
+
+def preprocess_status_file(raw_status_data, column_specs=CALCULATED_COLUMNS):
+    # Only row-wise columns are calculated per file, with the datetime index
+    # they'd see on the combined data; the rest are calculated on that.
+    # Leave already processed data untouched, as it may be cached.
+    if DATETIME_COLNAME not in raw_status_data.columns:
+        return raw_status_data
+    if not pd.api.types.is_datetime64_any_dtype(
+            raw_status_data[DATETIME_COLNAME]):
+        raw_status_data[DATETIME_COLNAME] = parse_status_datetimes(
+            raw_status_data[DATETIME_COLNAME])
+    row_wise_specs = get_row_wise_specs(column_specs)
+    if row_wise_specs:
+        raw_status_data = calculate_columns(
+            raw_status_data.set_index(DATETIME_COLNAME, drop=False),
+            column_specs=row_wise_specs,
+            ).reset_index(drop=True)
+    return raw_status_data
+
+
+def load_status_file_cached(
+        path, load_function=read_status_csv, column_specs=CALCULATED_COLUMNS,
+        completed=True, **load_kwargs):
+    # Completed files are loaded from/saved to the cache, already processed
+    if completed:
+        cache_path = get_status_cache_path(
+            path,
+            column_specs=column_specs,
+            usecols=load_kwargs.get("usecols", None),
+            )
+        try:
+            status_data = read_status_cache(cache_path)
+        except Exception as error:
+            print(f"Error reading cached data for {Path(path).as_posix()!r}")
+            print(f"{type(error).__name__}: {error}")
+            status_data = None
+        if status_data is not None:
+            return status_data
+
+    status_data = preprocess_status_file(
+        load_function(path, **load_kwargs), column_specs=column_specs)
+
+    if completed:
+        try:
+            write_status_cache(status_data, cache_path)
+        except Exception as error:
+            print(f"Error caching data for {Path(path).as_posix()!r}")
+            print(f"{type(error).__name__}: {error}")
+    return status_data
+
+
+def iter_status_file_chunks(
+        path, chunk_rows=INGEST_STREAMING_CHUNK_ROWS, **read_csv_kwargs):
+    # The pyarrow engine doesn't support reading in chunks
+    if read_csv_kwargs.get("engine", None) == "pyarrow":
+        read_csv_kwargs = {
+            **{key: value for key, value in read_csv_kwargs.items()
+               if key != "engine"},
+            **_get_bad_lines_kwargs(),
+            }
+    chunk_reader = pd.read_csv(path, chunksize=chunk_rows, **read_csv_kwargs)
+    try:
+        yield from chunk_reader
+    finally:
+        chunk_reader.close()
+
+
+def stream_status_file(
+        path,
+        column_specs=CALCULATED_COLUMNS,
+        decimate=INGEST_STREAMING_DECIMATE,
+        memory_limit_mb=INGEST_MEMORY_LIMIT_MB,
+        chunk_rows=INGEST_STREAMING_CHUNK_ROWS,
+        **read_csv_kwargs,
+        ):
+    # Process chunk by chunk, halving resolution as needed to stay in limits
+    chunks = iter_status_file_chunks(
+        path, chunk_rows=chunk_rows, **read_csv_kwargs)
+    if decimate and decimate > 1:
+        chunks = (chunk.iloc[::decimate, :] for chunk in chunks)
+    chunks = (
+        compact_status_data(
+            preprocess_status_file(chunk, column_specs=column_specs),
+            categorical_columns=(),
+            )
+        for chunk in chunks)
+
+    kept_chunks = []
+    memory_usage = 0
+    limit_decimate = 1
+    for chunk in chunks:
+        if limit_decimate > 1:
+            chunk = chunk.iloc[::limit_decimate, :]
+        kept_chunks.append(chunk)
+        memory_usage += get_memory_usage(chunk)
+        while (memory_limit_mb and memory_usage > memory_limit_mb * 2**20
+               and max(len(kept_chunk) for kept_chunk in kept_chunks) > 1):
+            limit_decimate *= 2
+            kept_chunks = [
+                kept_chunk.iloc[::2, :] for kept_chunk in kept_chunks]
+            memory_usage = sum(
+                get_memory_usage(kept_chunk) for kept_chunk in kept_chunks)
+
+    if limit_decimate > 1:
+        print(f"Data at {Path(path).as_posix()!r} exceeded memory limit of "
+              f"{memory_limit_mb} MiB; decimated by {limit_decimate}")
+    if not kept_chunks:
+        return pd.DataFrame()
+    return pd.concat(kept_chunks, ignore_index=True, sort=False)
+
+
+def load_status_file_streaming(
+        path, load_function=read_status_csv, column_specs=CALCULATED_COLUMNS,
+        threshold_mb=INGEST_STREAMING_THRESHOLD_MB, **read_csv_kwargs):
+    # Stream files over the size threshold; otherwise load them as usual
+    if Path(path).stat().st_size > threshold_mb * 1e6:
+        return stream_status_file(
+            path, column_specs=column_specs, **read_csv_kwargs)
+    return preprocess_status_file(
+        load_function(path, **read_csv_kwargs), column_specs=column_specs)
+
+
+def load_status_data(n_days=None, lag=None, data_dir=DATA_DIR_CLIENT,
+                     glob_pattern=GLOB_PATTERN_CLIENT,
+                     incremental=INGEST_INCREMENTAL,
+                     disk_cache=INGEST_DISK_CACHE,
+                     column_specs=CALCULATED_COLUMNS,
+                     engine=CSV_ENGINE_CLIENT,
+                     streaming_threshold_mb=INGEST_STREAMING_THRESHOLD_MB,
+                     usecols=None):
+    files_to_load = get_status_data_paths(
+        n_days=n_days, lag=lag, data_dir=data_dir, glob_pattern=glob_pattern)
+
+    read_csv_kwargs = get_read_csv_kwargs(engine=engine, usecols=usecols)
 
     def _on_load_error(_error_obj, *pd_args, **pd_kwargs):
         print(f"Error loading data at {pd_args[0].as_posix()!r}")
         print(f"{type(_error_obj).__name__}: {_error_obj}")
         return pd.DataFrame()
 
+    if incremental:
+        evict_status_file_cache(data_dir, keep_paths=files_to_load)
+
+        load_function = functools.partial(
+            read_status_file_processed, column_specs=column_specs)
+    else:
+        load_function = read_status_csv
+
+    if streaming_threshold_mb is not None:
+        load_function = functools.partial(
+            load_status_file_streaming,
+            load_function=load_function,
+            column_specs=column_specs,
+            threshold_mb=streaming_threshold_mb,
+            )
+
+    if disk_cache:
+        # All files but the newest are complete unless lagging behind it
+        completed_files = set(files_to_load if lag else files_to_load[:-1])
+        file_load_functions = {
+            file: functools.partial(
+                load_status_file_cached,
+                load_function=load_function,
+                column_specs=column_specs,
+                completed=file in completed_files,
+                )
+            for file in files_to_load}
+    else:
+        file_load_functions = {file: load_function for file in files_to_load}
+
     status_data = pd.concat(
         (
             sindri.utils.misc.handle_errors(
-            on_error=_on_load_error)(pd.read_csv)(file, **read_csv_kwargs)
+            on_error=_on_load_error)(file_load_functions[file])(
+                file, **read_csv_kwargs)
             for file in files_to_load
             ),
         ignore_index=True,
@@ -99,62 +718,481 @@ def load_status_data(n_days=None, lag=None, data_dir=DATA_DIR_CLIENT,
     return status_data
 
 
-def calculate_columns(df, column_specs=CALCULATED_COLUMNS):
-    for colname, after_col, col_function in column_specs:
-        if after_col:
-            insert_location = df.columns.get_loc(after_col) + 1
+def _unpack_column_spec(column_spec):
+    # Specs are (colname, after_col, col_function[, depends_on[, row_wise]])
+    colname, after_col, col_function, *spec_options = column_spec
+    depends_on, row_wise = (*spec_options, None, False)[:2]
+    return colname, after_col, col_function, depends_on, bool(row_wise)
+
+
+def get_row_wise_specs(column_specs=CALCULATED_COLUMNS):
+    # Specs flagged row-wise only use each row's own values, so they can be
+    # computed for new rows alone, unless they depend on other columns that
+    # need the whole data (e.g. windows or diffs)
+    calculated_colnames = {
+        _unpack_column_spec(column_spec)[0] for column_spec in column_specs}
+    earlier_colnames = []
+    row_wise_colnames = set()
+    row_wise_specs = []
+    for column_spec in column_specs:
+        colname, __, __, depends_on, row_wise = _unpack_column_spec(
+            column_spec)
+        if depends_on is None:
+            depends_on = earlier_colnames
+        if row_wise and all(
+                dependency in row_wise_colnames for dependency in depends_on
+                if dependency in calculated_colnames):
+            row_wise_colnames.add(colname)
+            row_wise_specs.append(column_spec)
+        earlier_colnames.append(colname)
+    return row_wise_specs
+
+
+def get_column_spec_levels(column_specs=CALCULATED_COLUMNS):
+    # Group specs so each only depends on columns from earlier groups; specs
+    # that don't declare their dependencies depend on all those before them
+    calculated_colnames = {
+        _unpack_column_spec(column_spec)[0] for column_spec in column_specs}
+    colname_levels = {}
+    spec_levels = []
+    for column_spec in column_specs:
+        colname, __, __, depends_on, __ = _unpack_column_spec(column_spec)
+        if depends_on is None:
+            depends_on = colname_levels.keys()
+        depends_on = [
+            dependency for dependency in depends_on
+            if dependency in calculated_colnames]
+        for dependency in depends_on:
+            if dependency not in colname_levels:
+                raise ValueError(
+                    f"Calculated column {colname!r} depends on "
+                    f"{dependency!r}, which must be listed before it")
+        level = max(
+            (colname_levels[dependency] + 1 for dependency in depends_on),
+            default=0)
+        colname_levels[colname] = level
+        if level == len(spec_levels):
+            spec_levels.append([])
+        spec_levels[level].append(column_spec)
+    return spec_levels
+
+
+def calculate_columns(df, column_specs=CALCULATED_COLUMNS,
+                      max_workers=CALCULATED_COLUMNS_WORKERS):
+    # Skip columns already calculated, e.g. loaded from the cache
+    column_specs = [
+        column_spec for column_spec in column_specs
+        if _unpack_column_spec(column_spec)[0] not in df.columns]
+    if not column_specs:
+        return df
+
+    calculated_df = df
+    for level_specs in get_column_spec_levels(column_specs):
+        col_functions = [
+            _unpack_column_spec(column_spec)[2] for column_spec in level_specs]
+        if max_workers and len(level_specs) > 1:
+            executor = get_ingest_executor(
+                "thread", max_workers, executors=_CALCULATION_EXECUTORS)
+            level_values = list(executor.map(
+                lambda col_function: col_function(calculated_df),
+                col_functions,
+                ))
+        else:
+            level_values = [
+                col_function(calculated_df) for col_function in col_functions]
+        level_columns = pd.DataFrame(
+            {_unpack_column_spec(column_spec)[0]: values
+             for column_spec, values in zip(level_specs, level_values)},
+            index=df.index,
+            )
+        calculated_df = pd.concat(
+            (calculated_df, level_columns), axis=1, copy=False)
+
+    # Work out the final column order, then assemble the frame in one go
+    column_order = list(df.columns)
+    for column_spec in column_specs:
+        colname, after_col, __, __, __ = _unpack_column_spec(column_spec)
+        if after_col and after_col in column_order:
+            insert_location = column_order.index(after_col) + 1
+        elif after_col and after_col == df.index.name:
+            insert_location = 0
         else:
-            insert_location = len(df.columns)
-        df.insert(insert_location, colname, col_function(df))
-    return df
+            insert_location = len(column_order)
+        column_order.insert(insert_location, colname)
+    if column_order == list(calculated_df.columns):
+        return calculated_df
+    return calculated_df.reindex(columns=column_order, copy=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_fast_datetime_masks():
+    # XOR with the template maps digits to 0-9 and separators/padding to 0;
+    # a valid value then has no bits set in the check mask, even after
+    # adding 6 to each digit (which carries into the high nibble if > 9)
+    template = FAST_DATETIME_TEMPLATE.ljust(FAST_DATETIME_ROW_BYTES, b"\x00")
+    check_mask = bytes(
+        0xF0 if template_byte == ord("0") else 0xFF
+        for template_byte in template)
+    six_mask = bytes(
+        0x06 if template_byte == ord("0") else 0x00
+        for template_byte in template)
+    return tuple(
+        np.frombuffer(mask_bytes, dtype="<u8")
+        for mask_bytes in (template, check_mask, six_mask))
+
+
+def _parse_datetime_block(values):
+    # Parse a block of strings SWAR-style as little-endian uint64 words
+    # Returns datetime64[ns] values, or None to fall back to the full parser
+    template, check_mask, six_mask = _get_fast_datetime_masks()
+    raw_bytes = np.asarray(values, dtype=f"S{FAST_DATETIME_ROW_BYTES}")
+    words = raw_bytes.view("<u8").reshape(-1, len(template)) ^ template
+
+    null_mask = None
+    if ((words | (words + six_mask)) & check_mask).any():
+        invalid = ((words | (words + six_mask)) & check_mask).any(axis=1)
+        null_mask = pd.isna(values)
+        if (invalid & ~null_mask).any():
+            return None
+        words[null_mask] = np.frombuffer(
+            b"1970-01-01 00:00:00.000000".ljust(len(template) * 8, b"\x00"),
+            dtype="<u8",
+            ) ^ template
+
+    # Combine each digit with the next, giving two-digit values at each byte
+    digit_pairs = words * np.uint64(10) + (words >> np.uint64(8))
+
+    def _pair(word_idx, byte_idx):
+        return ((digit_pairs[:, word_idx] >> np.uint64(8 * byte_idx))
+                & np.uint64(0xFF)).astype(np.int64)
+
+    # Byte layout: "YYYY-MM-" "DD HH:MM" ":SS.ffff" "ff" + null padding
+    year = _pair(0, 0) * 100 + _pair(0, 2)
+    month, day = _pair(0, 5), _pair(1, 0)
+    hour, minute, second = _pair(1, 3), _pair(1, 6), _pair(2, 1)
+    microsecond = _pair(2, 4) * 10000 + _pair(2, 6) * 100 + _pair(3, 0)
+
+    year_min, year_max = year.min(), year.max()
+    if (year_min < 1678 or year_max > 2261
+            or ((month < 1) | (month > 12) | (day < 1)).any()
+            or ((hour > 23) | (minute > 59) | (second > 59)).any()):
+        return None
+    month_starts = np.arange(
+        (year_min - 1970) * 12, (year_max + 1 - 1970) * 12 + 1,
+        ).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    month_idx = (year - year_min) * 12 + month - 1
+    month_start = month_starts[month_idx]
+    if (day > month_starts[month_idx + 1] - month_start).any():
+        return None
+
+    parsed = (((((month_start + day - 1) * 24 + hour) * 60 + minute) * 60
+               + second) * 1000000 + microsecond) * 1000
+    parsed = parsed.view("datetime64[ns]")
+    if null_mask is not None:
+        parsed[null_mask] = np.datetime64("NaT")
+    return parsed
+
+
+def _parse_datetimes_fixed(datetimes):
+    # Work in cache-sized blocks, as the parse is memory bandwidth-bound
+    values = datetimes.to_numpy()
+    if not len(values):
+        return None
+    parsed = np.empty(len(values), dtype="datetime64[ns]")
+    for block_start in range(0, len(values), FAST_DATETIME_BLOCK_ROWS):
+        block_end = block_start + FAST_DATETIME_BLOCK_ROWS
+        try:
+            parsed_block = _parse_datetime_block(
+                values[block_start:block_end])
+        except (TypeError, ValueError, UnicodeEncodeError):
+            return None
+        if parsed_block is None:
+            return None
+        parsed[block_start:block_end] = parsed_block
+    return pd.Series(parsed, index=datetimes.index, name=datetimes.name)
+
+
+def parse_status_datetimes(
+        datetimes, datetime_format=DATETIME_FORMAT, fast=True):
+    if pd.api.types.is_datetime64_any_dtype(datetimes):
+        return datetimes
+    if fast and datetime_format == FAST_DATETIME_FORMAT:
+        parsed_datetimes = _parse_datetimes_fixed(datetimes)
+        if parsed_datetimes is not None:
+            return parsed_datetimes
+    return pd.to_datetime(
+        datetimes, format=datetime_format).dt.tz_localize(None)
+
+
+def compact_status_data(
+        status_data,
+        float_dtype=COMPACT_FLOAT_DTYPE,
+        downcast_integers=COMPACT_INTEGERS,
+        categorical_columns=COMPACT_CATEGORICAL_COLUMNS,
+        ):
+    # Categorical columns can be given by name, or as True for all strings
+    compact_columns = {}
+    for colname, column in status_data.items():
+        if colname == DATETIME_COLNAME:
+            continue
+        if pd.api.types.is_float_dtype(column.dtype):
+            if float_dtype and column.dtype != float_dtype:
+                compact_columns[colname] = column.astype(float_dtype)
+        elif pd.api.types.is_integer_dtype(column.dtype):
+            if downcast_integers:
+                compact_columns[colname] = pd.to_numeric(
+                    column, downcast="integer")
+        elif pd.api.types.is_object_dtype(column.dtype):
+            if categorical_columns is True or (
+                    categorical_columns and colname in categorical_columns):
+                compact_columns[colname] = column.astype("category")
+
+    if compact_columns:
+        status_data = status_data.assign(**compact_columns)
+    return status_data
+
+
+def get_memory_usage(status_data):
+    return int(status_data.memory_usage(index=True, deep=True).sum())
+
+
+def print_memory_usage(status_data_units):
+    total_usage = 0
+    for unit, status_data in status_data_units.items():
+        memory_usage = get_memory_usage(status_data)
+        total_usage += memory_usage
+        print(f"Memory usage for {unit!r}: {memory_usage / 2**20:.2f} MiB "
+              f"({len(status_data)} rows x {len(status_data.columns)} cols)")
+    print(f"Total status data memory usage: {total_usage / 2**20:.2f} MiB")
 
 
 def preprocess_status_data(
-        raw_status_data, decimate=None, column_specs=CALCULATED_COLUMNS):
+        raw_status_data, decimate=None, column_specs=CALCULATED_COLUMNS,
+        compact=True, datetime_index_only=COMPACT_DATETIME_INDEX):
     if decimate:
         status_data = raw_status_data.iloc[::decimate, :]
     else:
         status_data = raw_status_data
-    status_data[DATETIME_COLNAME] = pd.to_datetime(
-        status_data[DATETIME_COLNAME],
-        format=DATETIME_FORMAT,
-        ).dt.tz_localize(None)
-    status_data.set_index(DATETIME_COLNAME, drop=False, inplace=True)
+    status_data[DATETIME_COLNAME] = parse_status_datetimes(
+        status_data[DATETIME_COLNAME])
+    status_data.set_index(
+        DATETIME_COLNAME, drop=datetime_index_only, inplace=True)
     status_data = status_data[status_data.index.notnull()]
 
     if column_specs:
         status_data = calculate_columns(status_data, column_specs=column_specs)
 
+    if compact:
+        status_data = compact_status_data(status_data)
+
+    return status_data
+
+
+def ingest_status_data_buffered(
+        n_days=None, data_dir=DATA_DIR_CLIENT,
+        glob_pattern=GLOB_PATTERN_CLIENT, lag=None, decimate=None,
+        column_specs=CALCULATED_COLUMNS, engine=CSV_ENGINE_CLIENT,
+        usecols=None, buffers=_STATUS_DATA_BUFFERS):
+    # Append only newly written rows to a long-lived per-directory buffer
+    files_to_load = get_status_data_paths(
+        n_days=n_days, lag=lag, data_dir=data_dir, glob_pattern=glob_pattern)
+    buffer_key = Path(data_dir).as_posix()
+    buffer_state = buffers.get(buffer_key, None)
+    read_csv_kwargs = get_read_csv_kwargs(engine=engine, usecols=usecols)
+
+    def _read_files():
+        file_results = {}
+        for file in files_to_load:
+            try:
+                file_results[file.as_posix()] = read_status_file_incremental(
+                    file, read_csv_kwargs=read_csv_kwargs, keep_data=False)
+            except Exception as error:
+                print(f"Error loading data at {file.as_posix()!r}")
+                print(f"{type(error).__name__}: {error}")
+        return file_results
+
+    # Rebuild if an ingested file was reset or read elsewhere since, or a
+    # new one sorts before it
+    rebuild = buffer_state is None or any(
+        file_key not in _STATUS_FILE_CACHE
+        or _STATUS_FILE_CACHE[file_key]["offset"]
+        != buffer_state["offsets"].get(file_key, None)
+        for file_key in buffer_state["files"])
+    if not rebuild:
+        file_results = _read_files()
+        last_ingested = max(buffer_state["files"], default="")
+        for file_key, (__, __, was_reset) in file_results.items():
+            if file_key in buffer_state["files"]:
+                rebuild = rebuild or was_reset
+            else:
+                rebuild = rebuild or file_key < last_ingested
+    if rebuild:
+        evict_status_file_cache(data_dir, keep_paths=())
+        file_results = _read_files()
+    else:
+        evict_status_file_cache(data_dir, keep_paths=files_to_load)
+
+    new_frames = []
+    file_starts = {} if rebuild else buffer_state["starts"]
+    for file_key, (file_data, new_data, __) in file_results.items():
+        if rebuild or file_key not in buffer_state["files"]:
+            new_data = file_data
+            file_starts[file_key] = parse_status_datetimes(
+                file_data[DATETIME_COLNAME].iloc[:1]).min()
+        if len(new_data):
+            new_frames.append(new_data)
+    if new_frames:
+        # Row-wise columns are only calculated for the new rows; the rest
+        # are calculated on the whole buffer below
+        new_status_data = preprocess_status_data(
+            pd.concat(new_frames, ignore_index=True, sort=False),
+            decimate=decimate,
+            column_specs=get_row_wise_specs(column_specs),
+            )
+    elif rebuild:
+        raise ValueError(f"No status data found in {buffer_key!r}")
+
+    if rebuild:
+        buffer_state = {
+            "buffer": sindri.utils.ringbuffer.TimeSeriesRingBuffer(
+                new_status_data)}
+        buffers[buffer_key] = buffer_state
+    elif new_frames:
+        buffer_state["buffer"].append(new_status_data)
+    buffer_state["files"] = set(file_results.keys())
+    buffer_state["offsets"] = {
+        file_key: _STATUS_FILE_CACHE[file_key]["offset"]
+        for file_key in file_results if file_key in _STATUS_FILE_CACHE}
+    buffer_state["starts"] = {
+        file_key: file_starts[file_key] for file_key in file_results}
+
+    # Drop the rows from files no longer selected, which all sort earlier
+    status_buffer = buffer_state["buffer"]
+    file_starts = [
+        file_start for file_start in buffer_state["starts"].values()
+        if pd.notnull(file_start)]
+    if file_starts and len(status_buffer):
+        status_buffer.evict_before(min(file_starts))
+
+    status_data = status_buffer.to_frame()
+    calculated_data = calculate_columns(status_data, column_specs=column_specs)
+    if calculated_data is not status_data:
+        status_data = compact_status_data(calculated_data)
     return status_data
 
 
 def ingest_status_data_client(
-        n_days=None, data_dir=DATA_DIR_CLIENT, lag=0, decimate=None):
-    raw_status_data = load_status_data(
-        n_days=n_days, data_dir=data_dir, lag=lag)
-    status_data = preprocess_status_data(raw_status_data, decimate=decimate)
+        n_days=None, data_dir=DATA_DIR_CLIENT, lag=0, decimate=None,
+        ring_buffer=INGEST_RING_BUFFER, usecols=None):
+    if ring_buffer:
+        status_data = ingest_status_data_buffered(
+            n_days=n_days, data_dir=data_dir, lag=lag, decimate=decimate,
+            usecols=usecols)
+    else:
+        raw_status_data = load_status_data(
+            n_days=n_days, data_dir=data_dir, lag=lag, usecols=usecols)
+        status_data = preprocess_status_data(
+            raw_status_data, decimate=decimate)
+    if REPORT_MEMORY_USAGE:
+        print_memory_usage({"client": status_data})
     return status_data
 
 
-def ingest_status_data_server(
-        n_days=None, data_dir=DATA_DIR_SERVER, unit_dirs=UNIT_DIRS_SERVER):
-    status_data_units = {}
-    for unit_dir in unit_dirs:
-        data_subdir = data_dir / unit_dir / DATA_SUBDIR_SERVER
-        try:
+def get_ingest_executor(
+        executor_type, max_workers=None, worker_index=None,
+        executors=_INGEST_EXECUTORS, lock=_INGEST_EXECUTORS_LOCK):
+    executor_key = (executor_type, max_workers, worker_index)
+    with lock:
+        if executor_key not in executors:
+            try:
+                executor_class = INGEST_EXECUTOR_CLASSES[executor_type]
+            except KeyError as error:
+                raise ValueError(
+                    "Ingest executor must be one of "
+                    f"{{None, {', '.join(map(repr, INGEST_EXECUTOR_CLASSES))}}}"
+                    f", not {executor_type!r}") from error
+            executors[executor_key] = executor_class(max_workers=max_workers)
+        return executors[executor_key]
+
+
+def get_unit_executors(executor_type, unit_dirs, max_workers=None):
+    # The incremental caches and ring buffers are per-process, so with a
+    # process pool each unit is pinned to its own single-worker pool
+    if executor_type != "process":
+        executor = get_ingest_executor(executor_type, max_workers)
+        return {unit_dir: executor for unit_dir in unit_dirs}
+    n_workers = max_workers or os.cpu_count() or 1
+    return {
+        unit_dir: get_ingest_executor(
+            executor_type, max_workers=1, worker_index=unit_idx % n_workers)
+        for unit_idx, unit_dir in enumerate(unit_dirs)}
+
+
+def ingest_status_data_unit(
+        unit_dir, n_days=None, data_dir=DATA_DIR_SERVER,
+        ring_buffer=INGEST_RING_BUFFER, usecols=None):
+    data_subdir = data_dir / unit_dir / DATA_SUBDIR_SERVER
+    try:
+        if ring_buffer:
+            status_data = ingest_status_data_buffered(
+                n_days=n_days,
+                data_dir=data_subdir,
+                glob_pattern=GLOB_PATTERN_SERVER,
+                column_specs=CALCULATED_COLUMNS_SERVER,
+                engine=CSV_ENGINE_SERVER,
+                usecols=usecols,
+                )
+        else:
             raw_status_data = load_status_data(
                 n_days=n_days,
                 data_dir=data_subdir,
                 glob_pattern=GLOB_PATTERN_SERVER,
+                column_specs=CALCULATED_COLUMNS_SERVER,
+                engine=CSV_ENGINE_SERVER,
+                usecols=usecols,
                 )
             status_data = preprocess_status_data(
-                raw_status_data, column_specs=())
-        except Exception as error:
-            print(f"Error loading data at {data_subdir.as_posix()!r}")
-            print(f"{type(error).__name__}: {error}")
-            continue
+                raw_status_data, column_specs=CALCULATED_COLUMNS_SERVER)
+    except Exception as error:
+        print(f"Error loading data at {data_subdir.as_posix()!r}")
+        print(f"{type(error).__name__}: {error}")
+        return None
+    return status_data
+
+
+def ingest_status_data_server(
+        n_days=None, data_dir=DATA_DIR_SERVER, unit_dirs=UNIT_DIRS_SERVER,
+        executor=INGEST_EXECUTOR_SERVER, max_workers=INGEST_WORKERS_SERVER,
+        usecols=None):
+    ingest_function = functools.partial(
+        ingest_status_data_unit,
+        n_days=n_days,
+        data_dir=data_dir,
+        usecols=usecols,
+        )
+
+    if executor and len(unit_dirs) > 1:
+        unit_executors = get_unit_executors(executor, unit_dirs, max_workers)
+        unit_futures = {
+            unit_dir: unit_executor.submit(ingest_function, unit_dir)
+            for unit_dir, unit_executor in unit_executors.items()}
+        unit_results = {}
+        for unit_dir, unit_future in unit_futures.items():
+            try:
+                unit_results[unit_dir] = unit_future.result()
+            except Exception as error:
+                print(f"Error ingesting data for unit {unit_dir.stem!r}")
+                print(f"{type(error).__name__}: {error}")
+    else:
+        unit_results = {
+            unit_dir: ingest_function(unit_dir) for unit_dir in unit_dirs}
 
-        status_data_units[unit_dir.stem] = status_data
+    status_data_units = {
+        unit_dir.stem: status_data
+        for unit_dir, status_data in unit_results.items()
+        if status_data is not None}
+    if REPORT_MEMORY_USAGE:
+        print_memory_usage(status_data_units)
     return status_data_units
 
 
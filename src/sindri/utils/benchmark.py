@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmarks comparing Sindri's optimized code paths against the originals.
+"""
+
+# Standard library imports
+import json
+from pathlib import Path
+import tempfile
+import time
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local imports
+import sindri.process
+import sindri.website.generate
+
+
+BENCHMARK_N_ROWS = 1000000
+BENCHMARK_N_REPEATS = 3
+
+
+def time_function(function, *args, n_repeats=BENCHMARK_N_REPEATS, **kwargs):
+    times = []
+    for __ in range(n_repeats):
+        start_time = time.perf_counter()
+        function(*args, **kwargs)
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def print_benchmark_results(name, results):
+    baseline_time = next(iter(results.values()))
+    print(f"{name}:")
+    for label, result_time in results.items():
+        print(f"    {label:<12} {result_time:8.3f} s "
+              f"({baseline_time / result_time:5.1f}x)")
+
+
+def generate_status_data(n_rows=BENCHMARK_N_ROWS, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.date_range("2020-01-01", periods=n_rows, freq="1s")
+    status_data = pd.DataFrame({
+        sindri.process.DATETIME_COLNAME: times.strftime(
+            sindri.process.FAST_DATETIME_FORMAT),
+        "value_1": rng.random(n_rows) * 100,
+        "value_2": rng.random(n_rows),
+        "value_3": rng.integers(0, 1000, n_rows),
+        })
+    return status_data
+
+
+def benchmark_datetime_parsing(n_rows=BENCHMARK_N_ROWS,
+                               n_repeats=BENCHMARK_N_REPEATS):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = Path(temp_dir) / "status_data.csv"
+        generate_status_data(n_rows=n_rows).to_csv(data_path, index=False)
+        datetimes = pd.read_csv(data_path)[sindri.process.DATETIME_COLNAME]
+
+    fast_result = sindri.process.parse_status_datetimes(
+        datetimes, datetime_format=sindri.process.FAST_DATETIME_FORMAT)
+    generic_result = sindri.process.parse_status_datetimes(
+        datetimes, datetime_format=sindri.process.FAST_DATETIME_FORMAT,
+        fast=False)
+    if not fast_result.equals(generic_result):
+        raise RuntimeError("Fast and generic datetime parsing results differ")
+
+    results = {
+        label: time_function(
+            sindri.process.parse_status_datetimes,
+            datetimes,
+            datetime_format=sindri.process.FAST_DATETIME_FORMAT,
+            fast=fast,
+            n_repeats=n_repeats,
+            )
+        for label, fast in (("generic", False), ("fast", True))}
+    print_benchmark_results(f"Datetime parsing ({n_rows} rows)", results)
+    return results
+
+
+def generate_plot_data(n_rows=BENCHMARK_N_ROWS, nan_fraction=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    plot_data = pd.DataFrame(
+        {
+            "value_1": rng.random(n_rows) * 100,
+            "value_2": rng.normal(size=n_rows),
+            "value_3": rng.integers(0, 1000, n_rows).astype(float),
+            },
+        index=pd.date_range("2020-01-01", periods=n_rows, freq="1s"),
+        )
+    plot_data.index.name = sindri.process.DATETIME_COLNAME
+    plot_data = plot_data.mask(rng.random(plot_data.shape) < nan_fraction)
+    plot_data.iloc[::997, 0] = np.inf
+    return plot_data
+
+
+def write_plot_json_generic(plot_data, output_path):
+    # The record-based path generate_plot_data used originally
+    plot_data_json = (
+        plot_data.where(np.isfinite(plot_data), None)
+        .replace({np.nan: None})
+        .to_dict(orient="list"))
+    plot_data_json[plot_data.index.name] = list(plot_data.index.astype(str))
+    sindri.website.generate.write_data_json(
+        plot_data_json, output_path, by_line=True)
+
+
+def write_plot_json_columnar(plot_data, output_path):
+    plot_data_json = {
+        colname: plot_data[colname].to_numpy()
+        for colname in plot_data.columns}
+    plot_data_json[plot_data.index.name] = np.asarray(
+        plot_data.index.astype(str))
+    sindri.website.generate.write_columnar_json(
+        plot_data_json, output_path, by_line=True)
+
+
+def benchmark_plot_json(n_rows=BENCHMARK_N_ROWS,
+                        n_repeats=BENCHMARK_N_REPEATS):
+    plot_data = generate_plot_data(n_rows=n_rows)
+    write_functions = {
+        "generic": write_plot_json_generic,
+        "columnar": write_plot_json_columnar,
+        }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_paths = {
+            label: Path(temp_dir) / f"plot_data_{label}.json"
+            for label in write_functions}
+        results = {
+            label: time_function(
+                write_function,
+                plot_data,
+                output_paths[label],
+                n_repeats=n_repeats,
+                )
+            for label, write_function in write_functions.items()}
+
+        output_data = []
+        for output_path in output_paths.values():
+            with open(output_path, "r", encoding="utf-8") as jsonfile:
+                output_data.append(json.load(jsonfile))
+        if output_data[0] != output_data[1]:
+            raise RuntimeError("Generic and columnar plot JSON outputs differ")
+
+    print_benchmark_results(f"Plot data JSON ({n_rows} rows)", results)
+    return results
+
+
+def run_benchmarks(n_rows=BENCHMARK_N_ROWS, n_repeats=BENCHMARK_N_REPEATS):
+    benchmark_datetime_parsing(n_rows=n_rows, n_repeats=n_repeats)
+    benchmark_plot_json(n_rows=n_rows, n_repeats=n_repeats)
+
+
+if __name__ == "__main__":
+    run_benchmarks()
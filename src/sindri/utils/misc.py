@@ -3,8 +3,11 @@ Utility functions for Sindri.
 """
 
 # Standard library imports
+import concurrent.futures
+import fnmatch
 import functools
 import getpass
+import hashlib
 from pathlib import Path
 import os
 import shutil
@@ -17,6 +20,10 @@ PACKAGE_NAME = "Sindri"
 WEBSITE_UPDATE_INTERVAL_S = 60
 TRIGGER_SIZE_MB = 22.0
 
+SYNC_LINK_MODES = ("hardlink", "reflink")
+SYNC_HASH_CHUNK_SIZE = 1024 * 1024
+FICLONE = 0x40049409
+
 
 def time_ns():
     # Fallback to non-ns time functions on Python <=3.6
@@ -111,6 +118,152 @@ def copytree(
             copy_function(source_item, destination_item)
 
 
+def hash_file(path):
+    file_hash = hashlib.sha1()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(SYNC_HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.digest()
+
+
+def _link_file(source, destination, link):
+    if link == "hardlink":
+        os.link(source, destination)
+    elif link == "reflink":
+        import fcntl
+        with open(source, "rb") as infile, open(destination, "wb") as outfile:
+            fcntl.ioctl(outfile.fileno(), FICLONE, infile.fileno())
+    else:
+        raise ValueError(
+            "Link mode must be one of "
+            f"{{None, {', '.join(SYNC_LINK_MODES)}}}, not {link!r}")
+
+
+def sync_file(source, destination, source_stat, destination_stat=None,
+              compare_hash=False, link=None):
+    # Returns the bytes written, or None if the destination was up to date
+    if (destination_stat is not None
+            and source_stat.st_size == destination_stat.st_size):
+        if source_stat.st_mtime_ns == destination_stat.st_mtime_ns:
+            return None
+        if compare_hash and hash_file(source) == hash_file(destination):
+            os.utime(destination, ns=(
+                destination_stat.st_atime_ns, source_stat.st_mtime_ns))
+            return None
+
+    # Write to a temporary file and rename it over the destination, so
+    # readers never see a partial file and hardlinks are never written into
+    temp_path = destination.with_name(f".{destination.name}.{os.getpid()}.tmp")
+    bytes_written = source_stat.st_size
+    linked = False
+    if link:
+        try:
+            _link_file(source, temp_path, link)
+            linked = True
+        except (OSError, ImportError):
+            pass
+    if linked:
+        bytes_written = 0
+    else:
+        shutil.copyfile(source, temp_path)
+    if not (linked and link == "hardlink"):
+        os.utime(temp_path,
+                 ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    os.replace(temp_path, destination)
+    return bytes_written
+
+
+def _remove_path(path, is_dir):
+    if is_dir:
+        shutil.rmtree(path, onerror=force_delete)
+    else:
+        os.remove(path)
+
+
+def synctree(
+        src,
+        dst,
+        ignore_patterns=None,
+        compare_hash=False,
+        link=None,
+        delete=False,
+        max_workers=None,
+        ):
+    # Copy only the files whose size and mtime (or hash) differ from the
+    # destination's, optionally linking them instead, and optionally delete
+    # any others; the destination may hold files other tools wrote.
+    # Hardlinked files share data with the source, so only link output that
+    # is replaced rather than modified in place.
+    source = Path(src).expanduser().resolve()
+    destination = Path(dst).expanduser().resolve()
+    if ignore_patterns is None:
+        ignore_patterns = ()
+    sync_stats = {
+        "files_copied": 0,
+        "files_skipped": 0,
+        "files_deleted": 0,
+        "bytes_copied": 0,
+        }
+
+    def _list_dir(path):
+        try:
+            with os.scandir(path) as entries:
+                return {
+                    entry.name: entry for entry in entries
+                    if not any(fnmatch.fnmatch(entry.name, pattern)
+                               for pattern in ignore_patterns)}
+        except FileNotFoundError:
+            return {}
+
+    sync_jobs = []
+    dirs_to_sync = [Path()]
+    while dirs_to_sync:
+        rel_dir = dirs_to_sync.pop()
+        (destination / rel_dir).mkdir(parents=True, exist_ok=True)
+        source_entries = _list_dir(source / rel_dir)
+        destination_entries = _list_dir(destination / rel_dir)
+
+        for name, source_entry in source_entries.items():
+            destination_entry = destination_entries.get(name, None)
+            source_is_dir = source_entry.is_dir()
+            if (destination_entry is not None
+                    and destination_entry.is_dir() != source_is_dir):
+                _remove_path(destination_entry.path, not source_is_dir)
+                destination_entry = None
+            if source_is_dir:
+                dirs_to_sync.append(rel_dir / name)
+                continue
+            sync_jobs.append((
+                Path(source_entry.path),
+                destination / rel_dir / name,
+                source_entry.stat(),
+                None if destination_entry is None
+                else destination_entry.stat(),
+                ))
+
+        if delete:
+            for name, destination_entry in destination_entries.items():
+                if name not in source_entries:
+                    _remove_path(
+                        destination_entry.path, destination_entry.is_dir())
+                    sync_stats["files_deleted"] += 1
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers) as executor:
+        bytes_written_all = executor.map(
+            lambda sync_job: sync_file(
+                *sync_job, compare_hash=compare_hash, link=link),
+            sync_jobs,
+            )
+        for bytes_written in bytes_written_all:
+            if bytes_written is None:
+                sync_stats["files_skipped"] += 1
+            else:
+                sync_stats["files_copied"] += 1
+                sync_stats["bytes_copied"] += bytes_written
+    return sync_stats
+
+
 def handle_errors(on_error=None):
     def _decorator(inner_function):
         @functools.wraps(inner_function)
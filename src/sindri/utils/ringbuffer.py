@@ -0,0 +1,144 @@
+"""
+Preallocated, array-backed ring buffer store for time-indexed status data.
+"""
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+
+RING_BUFFER_MIN_CAPACITY = 1024
+RING_BUFFER_GROWTH_FACTOR = 2
+
+
+def get_storage_dtype(dtype):
+    # Extension dtypes (e.g. categoricals) are stored as plain objects
+    if isinstance(dtype, np.dtype):
+        return dtype
+    return np.dtype(object)
+
+
+def is_storable(dtype, storage_dtype):
+    dtype = get_storage_dtype(dtype)
+    if dtype == storage_dtype or storage_dtype == np.dtype(object):
+        return True
+    if dtype.kind in "iub" and storage_dtype.kind == "f":
+        return True
+    return np.can_cast(dtype, storage_dtype, casting="same_kind")
+
+
+class TimeSeriesRingBuffer:
+    # Holds the rows in [start, end) of preallocated arrays, one 2D block
+    # per run of same-dtype columns, so frames are built without copies.
+    # When the arrays fill up, the live rows move to new arrays, so frames
+    # returned earlier still show the same data.
+
+    def __init__(self, initial_data, capacity=None):
+        self._reset(initial_data, capacity=capacity)
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def capacity(self):
+        return len(self._index)
+
+    def _reset(self, initial_data, capacity=None):
+        self.columns = list(initial_data.columns)
+        self.index_name = initial_data.index.name
+        self._blocks = []
+        for colname, dtype in initial_data.dtypes.items():
+            storage_dtype = get_storage_dtype(dtype)
+            if self._blocks and self._blocks[-1]["dtype"] == storage_dtype:
+                self._blocks[-1]["columns"].append(colname)
+            else:
+                self._blocks.append(
+                    {"columns": [colname], "dtype": storage_dtype})
+        self._start = self._end = 0
+        self._allocate(max(
+            capacity or 0,
+            len(initial_data) * RING_BUFFER_GROWTH_FACTOR,
+            RING_BUFFER_MIN_CAPACITY,
+            ))
+        self._write(initial_data)
+
+    def _allocate(self, capacity):
+        n_rows = len(self)
+        new_index = np.empty(capacity, dtype="datetime64[ns]")
+        if n_rows:
+            new_index[:n_rows] = self._index[self._start:self._end]
+        for block in self._blocks:
+            new_values = np.empty(
+                (len(block["columns"]), capacity), dtype=block["dtype"])
+            if n_rows:
+                new_values[:, :n_rows] = (
+                    block["values"][:, self._start:self._end])
+            block["values"] = new_values
+        self._index = new_index
+        self._start, self._end = 0, n_rows
+
+    def _is_compatible(self, new_data):
+        if list(new_data.columns) != self.columns:
+            return False
+        new_dtypes = new_data.dtypes
+        return all(
+            is_storable(new_dtypes[colname], block["dtype"])
+            for block in self._blocks for colname in block["columns"])
+
+    def _write(self, new_data):
+        n_new = len(new_data)
+        if self._end + n_new > self.capacity:
+            self._allocate(max(
+                self.capacity,
+                (len(self) + n_new) * RING_BUFFER_GROWTH_FACTOR,
+                ))
+        write_slice = slice(self._end, self._end + n_new)
+        self._index[write_slice] = new_data.index.to_numpy(
+            dtype="datetime64[ns]")
+        for block in self._blocks:
+            for row_idx, colname in enumerate(block["columns"]):
+                block["values"][row_idx, write_slice] = np.asarray(
+                    new_data[colname], dtype=block["dtype"])
+        self._end += n_new
+
+    def append(self, new_data):
+        if not len(new_data):
+            return
+        if self._is_compatible(new_data):
+            self._write(new_data)
+        else:
+            # Schema changed; rebuild with the union of columns and dtypes
+            self._reset(
+                pd.concat((self.to_frame(), new_data), sort=False),
+                capacity=self.capacity,
+                )
+
+    def evict_before(self, cutoff_time):
+        live_index = self._index[self._start:self._end]
+        keep_rows = live_index >= np.datetime64(cutoff_time, "ns")
+        if keep_rows.any():
+            self._start += int(np.argmax(keep_rows))
+        else:
+            self._start = self._end
+
+    def last_time(self):
+        if not len(self):
+            return None
+        return pd.Timestamp(self._index[self._end - 1])
+
+    def to_frame(self):
+        index = pd.DatetimeIndex(
+            self._index[self._start:self._end], name=self.index_name)
+        block_frames = [
+            pd.DataFrame(
+                block["values"][:, self._start:self._end].T,
+                columns=block["columns"],
+                index=index,
+                copy=False,
+                )
+            for block in self._blocks]
+        if not block_frames:
+            return pd.DataFrame(index=index)
+        if len(block_frames) == 1:
+            return block_frames[0]
+        return pd.concat(block_frames, axis=1, copy=False)
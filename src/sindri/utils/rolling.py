@@ -0,0 +1,104 @@
+"""
+Incrementally updated aggregates over sliding time windows of status data.
+"""
+
+# Standard library imports
+import collections
+import math
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+
+class RollingWindow:
+    # Keeps the values of one variable in the trailing time period, with
+    # monotonic deques for the min and max and a running sum for the mean,
+    # all of which skip NaNs. Each update only touches the rows appended or
+    # evicted since the last.
+
+    def __init__(self, period):
+        self.period_ns = pd.Timedelta(period).value
+        self.reset()
+
+    def __len__(self):
+        return len(self._values)
+
+    def reset(self):
+        self.last_time = None
+        self._values = collections.deque()
+        self._min_values = collections.deque()
+        self._max_values = collections.deque()
+        self._sum = 0.0
+        self._count = 0
+        self._n_since_resum = 0
+
+    def _append(self, time, value):
+        self._values.append((time, value))
+        if math.isnan(value):
+            return
+        self._sum += value
+        self._count += 1
+        while self._min_values and self._min_values[-1][1] >= value:
+            self._min_values.pop()
+        self._min_values.append((time, value))
+        while self._max_values and self._max_values[-1][1] <= value:
+            self._max_values.pop()
+        self._max_values.append((time, value))
+
+    def _evict(self, cutoff_time):
+        while self._values and self._values[0][0] <= cutoff_time:
+            __, value = self._values.popleft()
+            if not math.isnan(value):
+                self._sum -= value
+                self._count -= 1
+                self._n_since_resum += 1
+        for extreme_values in (self._min_values, self._max_values):
+            while extreme_values and extreme_values[0][0] <= cutoff_time:
+                extreme_values.popleft()
+        # Recompute the sum now and then so rounding errors don't build up
+        if self._n_since_resum > len(self._values):
+            self._sum = math.fsum(
+                value for __, value in self._values if not math.isnan(value))
+            self._n_since_resum = 0
+
+    def update(self, index, column):
+        # Takes the data's datetime index (as int64 ns) and variable column
+        if not len(index):
+            self.reset()
+            return
+        end_time = int(index[-1])
+        if self.last_time is not None and end_time < self.last_time:
+            self.reset()
+        start_idx = index.searchsorted(end_time - self.period_ns, side="right")
+        if self.last_time is not None:
+            start_idx = max(
+                start_idx, index.searchsorted(self.last_time, side="right"))
+
+        new_times = index[start_idx:].tolist()
+        new_values = column.iloc[start_idx:].to_numpy(
+            dtype=np.float64).tolist()
+        for time, value in zip(new_times, new_values):
+            self._append(time, value)
+        self.last_time = end_time
+        self._evict(end_time - self.period_ns)
+
+    def first(self):
+        if not self._values:
+            raise IndexError("No values in rolling window")
+        return self._values[0][1]
+
+    def min(self):
+        if not self._min_values:
+            return np.nan
+        return self._min_values[0][1]
+
+    def max(self):
+        if not self._max_values:
+            return np.nan
+        return self._max_values[0][1]
+
+    def mean(self):
+        if not self._count:
+            return np.nan
+        return self._sum / self._count
@@ -0,0 +1,205 @@
+"""
+Watchers reporting changes in data directories, via inotify or by polling.
+"""
+
+# Standard library imports
+import ctypes
+import ctypes.util
+import functools
+import os
+from pathlib import Path
+import select
+import struct
+import sys
+import time
+
+
+WATCH_POLL_INTERVAL_S = 1
+WATCH_READ_SIZE = 64 * 1024
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                 | IN_CREATE | IN_DELETE)
+INOTIFY_EVENT_FORMAT = "iIII"
+INOTIFY_EVENT_SIZE = struct.calcsize(INOTIFY_EVENT_FORMAT)
+
+
+@functools.lru_cache(maxsize=None)
+def get_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    libc_name = ctypes.util.find_library("c")
+    if libc_name is None:
+        return None
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+
+class PollingWatcher:
+    # Compares a listing of each directory every poll interval; missing
+    # directories are listed as empty, so they're still watched
+
+    def __init__(self, directories, poll_interval_s=WATCH_POLL_INTERVAL_S):
+        self.directories = [Path(directory) for directory in directories]
+        self.poll_interval_s = poll_interval_s
+        self.unwatched_dirs = set()
+        self._snapshots = {
+            directory: self._get_snapshot(directory)
+            for directory in self.directories}
+
+    @staticmethod
+    def _get_snapshot(directory):
+        snapshot = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        entry_stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    snapshot[entry.name] = (
+                        entry_stat.st_mtime_ns, entry_stat.st_size)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def read_changes(self, timeout_s):
+        end_time = time.monotonic() + timeout_s
+        while True:
+            changed_dirs = set()
+            for directory in self.directories:
+                snapshot = self._get_snapshot(directory)
+                if snapshot != self._snapshots[directory]:
+                    changed_dirs.add(directory)
+                    self._snapshots[directory] = snapshot
+            remaining_s = end_time - time.monotonic()
+            if changed_dirs or remaining_s <= 0:
+                return changed_dirs
+            time.sleep(min(self.poll_interval_s, remaining_s))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    # Blocks on an inotify descriptor with a watch on each directory.
+    # Directories that can't be watched (e.g. don't exist yet) or whose
+    # watch was dropped are retried on every read, and reported as changed
+    # once they're watched again.
+
+    def __init__(self, directories, retry_interval_s=WATCH_POLL_INTERVAL_S):
+        self.directories = [Path(directory) for directory in directories]
+        self.retry_interval_s = retry_interval_s
+        self._libc = get_libc()
+        if self._libc is None:
+            raise OSError("inotify is not available on this system")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error_number = ctypes.get_errno()
+            raise OSError(error_number, os.strerror(error_number))
+        self._watches = {}
+        self.unwatched_dirs = set(self.directories)
+        self._add_watches(verbose=True)
+
+    def _add_watches(self, verbose=False):
+        added_dirs = set()
+        for directory in sorted(self.unwatched_dirs):
+            watch_id = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), IN_WATCH_MASK)
+            if watch_id < 0:
+                if verbose:
+                    error_number = ctypes.get_errno()
+                    print(f"Can't watch directory {directory}; "
+                          "retrying on each check")
+                    print(f"OSError: {os.strerror(error_number)}")
+                continue
+            self._watches[watch_id] = directory
+            added_dirs.add(directory)
+        self.unwatched_dirs -= added_dirs
+        return added_dirs
+
+    def _read_events(self):
+        changed_dirs = set()
+        try:
+            event_buffer = os.read(self._fd, WATCH_READ_SIZE)
+        except BlockingIOError:
+            return changed_dirs
+        offset = 0
+        while offset + INOTIFY_EVENT_SIZE <= len(event_buffer):
+            watch_id, mask, __, name_length = struct.unpack_from(
+                INOTIFY_EVENT_FORMAT, event_buffer, offset)
+            offset += INOTIFY_EVENT_SIZE + name_length
+            if mask & IN_Q_OVERFLOW:
+                changed_dirs.update(self._watches.values())
+            elif mask & IN_IGNORED:
+                directory = self._watches.pop(watch_id, None)
+                if directory is not None:
+                    self.unwatched_dirs.add(directory)
+                    changed_dirs.add(directory)
+            elif watch_id in self._watches:
+                changed_dirs.add(self._watches[watch_id])
+        return changed_dirs
+
+    def read_changes(self, timeout_s):
+        end_time = time.monotonic() + timeout_s
+        while True:
+            if self.unwatched_dirs:
+                added_dirs = self._add_watches()
+                if added_dirs:
+                    return added_dirs
+            remaining_s = max(end_time - time.monotonic(), 0)
+            wait_s = remaining_s
+            if self.unwatched_dirs:
+                wait_s = min(remaining_s, self.retry_interval_s)
+            readable, __, __ = select.select([self._fd], [], [], wait_s)
+            if not readable:
+                if wait_s < remaining_s:
+                    continue
+                return set()
+            changed_dirs = self._read_events()
+            if changed_dirs:
+                return changed_dirs
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def get_directory_watcher(
+        directories, use_inotify=True, poll_interval_s=WATCH_POLL_INTERVAL_S):
+    if use_inotify:
+        try:
+            return InotifyWatcher(
+                directories, retry_interval_s=poll_interval_s)
+        except OSError as error:
+            print("Can't use inotify to watch data directories; polling")
+            print(f"{type(error).__name__}: {error}")
+    return PollingWatcher(directories, poll_interval_s=poll_interval_s)
+
+
+def wait_for_changes(watcher, timeout_s, debounce_s=0):
+    # Wait for a change, then keep collecting changes for up to debounce_s
+    # after it, so steady writes can't hold off the update, returning the
+    # changed directories (empty if the timeout was reached)
+    end_time = time.monotonic() + timeout_s
+    changed_dirs = watcher.read_changes(timeout_s)
+    end_time = min(end_time, time.monotonic() + debounce_s)
+    while changed_dirs and debounce_s:
+        remaining_s = end_time - time.monotonic()
+        if remaining_s <= 0:
+            break
+        new_changed_dirs = watcher.read_changes(remaining_s)
+        if not new_changed_dirs:
+            break
+        changed_dirs |= new_changed_dirs
+    return changed_dirs
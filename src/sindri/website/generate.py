@@ -3,14 +3,21 @@ Data, plots and calculations for the Mjolnir status website.
 """
 
 # Standard library imports
+import contextlib
 import copy
 import datetime
+import fnmatch
+import functools
+import gzip
+import hashlib
 import json
 import os
 from pathlib import Path
+import re
 import shutil
 import time
 import traceback
+import types
 
 # Third party imports
 import importlib_metadata
@@ -18,7 +25,9 @@ import numpy as np
 import pandas as pd
 
 # Local imports
+import sindri.config.website
 import sindri.process
+import sindri.utils.rolling
 import sindri.website.preprocess
 import sindri.website.templates
 
@@ -35,11 +44,23 @@ LEKTOR_ICON_VERSION_PATH = THEME_PATH / "lektor-icon" / "_version.txt"
 LASTUPDATE_FILENAME = "{section_id}_lastupdate.json"
 DATA_FILENAME = "{section_id}_data.{extension}"
 DEFAULT_EXTENSION = "json"
+DELTA_FILENAME = "{stem}_{base}_{sequence}{suffix}"
+DELTA_LASTUPDATE_KEYS = ("deltaBase", "deltaSequence", "deltaWindow")
+DELTA_MAX_CHUNKS = 100
+LISTING_RACY_NS = 2 * 10**9
+BINARY_EXTENSION = "bin"
+
+BINARY_MAGIC = b"SDC1"
+BINARY_ALIGNMENT = 8
+BINARY_TIME_RESOLUTION = "1ms"
 
 STATUS_UPDATE_INTERVAL_SECONDS = 10
 STATUS_UPDATE_INTERVAL_FAST_SECONDS = 1
 STATUS_UPDATE_INTERVAL_SLOW_SECONDS = 300
 
+_PLOT_DELTA_STATES = {}
+_COMPRESSED_DIGESTS = {}
+
 DASHBOARD_DATA_ARGS_DEFAULT = {
     "data_functions": [
         lambda base_data, data_args: base_data.iloc[-1],
@@ -54,6 +75,39 @@ DASHBOARD_DATA_ARGS_DEFAULT = {
     "threshold_type": None,
     }
 
+# NaN-ignoring, like the builtin min/max used on the values before
+DASHBOARD_REDUCERS = {
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "mean": np.nanmean,
+    "median": np.nanmedian,
+    }
+DASHBOARD_PERCENTILE_PATTERN = r"p(\d+(?:\.\d+)?)"
+DASHBOARD_ROLLING_REDUCERS = {"min", "max", "mean"}
+
+# Rolling windows for dashboard values, keyed by unit, variable and period
+_DASHBOARD_ROLLING_WINDOWS = {}
+
+# Compiled content plans and the configs they were compiled from, by mode
+_CONTENT_PLANS = {}
+
+# Intermediate tabular data shared between blocks during an update cycle
+_TABULAR_DATA_CACHE = {"frames": None, "hits": 0, "misses": 0}
+
+# Last written lastupdate data by path, loaded from disk on first use
+_LASTUPDATE_STATES = {}
+
+# Input directory listings, file mtimes and pending lastupdate writes for
+# a cycle
+_CHANGE_DETECTION = {"listings": None, "mtimes": None, "pending": None}
+
+# Status data ingested by the last update and the columns read, by mode
+_INGESTED_DATA = {}
+
+# Directory listings kept across cycles, with the directory mtime (ns) they
+# were listed at and when, so unchanged directories aren't listed again
+_DIRECTORY_LISTINGS = {}
+
 
 def safe_nan(value):
     if not np.isfinite(value):
@@ -79,6 +133,73 @@ class CustomJSONEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+@functools.lru_cache(maxsize=None)
+def get_brotli_module():
+    try:
+        import brotli
+    except ImportError:
+        print("Brotli not installed; skipping writing .br files")
+        return None
+    return brotli
+
+
+def write_gzip_file(outfile, content, filename=""):
+    # Write reproducible gzip output with a fixed header timestamp
+    with gzip.GzipFile(
+            filename=filename, mode="wb", fileobj=outfile,
+            mtime=0) as gzip_file:
+        gzip_file.write(content)
+
+
+def get_compressor(compression_format):
+    # Function writing content to a file object, or None if not available
+    if compression_format == "gz":
+        return write_gzip_file
+    if compression_format == "br":
+        brotli = get_brotli_module()
+        if brotli is None:
+            return None
+        return lambda outfile, content, filename="": outfile.write(
+            brotli.compress(content))
+    raise ValueError(
+        f"Compression format must be one of {{'gz', 'br'}}, "
+        f"not {compression_format!r}")
+
+
+def write_compressed_files(
+        path, formats=sindri.config.website.OUTPUT_COMPRESSION):
+    # Write precompressed copies next to the file for static serving,
+    # only recompressing when the file's content has changed
+    if not formats:
+        return
+    path = Path(path)
+    compressors = {
+        compression_format: get_compressor(compression_format)
+        for compression_format in formats}
+    compressed_paths = {
+        compression_format: path.with_name(
+            f"{path.name}.{compression_format}")
+        for compression_format, compressor in compressors.items()
+        if compressor is not None}
+    with open(path, "rb") as infile:
+        content = infile.read()
+    content_digest = hashlib.sha1(content).digest()
+    if (_COMPRESSED_DIGESTS.get(path, None) == content_digest
+            and all(compressed_path.exists()
+                    for compressed_path in compressed_paths.values())):
+        return
+
+    # Replace each file atomically, as the server may be reading it
+    for compression_format, compressed_path in compressed_paths.items():
+        temp_path = compressed_path.with_name(
+            f".{compressed_path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "wb") as outfile:
+            compressors[compression_format](
+                outfile, content, filename=path.name)
+        os.replace(temp_path, compressed_path)
+    _COMPRESSED_DIGESTS[path] = content_digest
+
+
 def write_data_json(output_data, path, by_line=False):
     if by_line:
         separators = (",\n", ":")
@@ -89,6 +210,132 @@ def write_data_json(output_data, path, by_line=False):
                   separators=separators, cls=CustomJSONEncoder)
 
 
+def format_json_array(values, separator=",", precision=None):
+    # Format numeric arrays in bulk from their buffers, with non-finite
+    # values written as null; datetimes are written as strings and other
+    # dtypes go through the JSON encoder
+    if pd.api.types.is_datetime64_any_dtype(values):
+        datetimes = pd.DatetimeIndex(values)
+        value_strings = np.char.add(
+            np.char.add('"', datetimes.astype(str).to_numpy(dtype=str)), '"')
+        value_strings[datetimes.isna()] = "null"
+        return "[" + separator.join(value_strings.tolist()) + "]"
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        if precision is not None:
+            values = np.round(values, precision)
+        value_strings = values.astype(str)
+        value_strings[~np.isfinite(values)] = "null"
+    elif values.dtype.kind in "iu":
+        value_strings = values.astype(str)
+    elif values.dtype.kind == "b":
+        value_strings = np.where(values, "true", "false")
+    else:
+        value_list = [
+            None if isinstance(value, float) and not np.isfinite(value)
+            else value for value in values.tolist()]
+        return json.dumps(value_list, separators=(separator, ":"),
+                          cls=CustomJSONEncoder)
+    return "[" + separator.join(value_strings.tolist()) + "]"
+
+
+def write_columnar_json(output_data, path, by_line=False, precision=None):
+    separator = ",\n" if by_line else ","
+    with open(path, "w", encoding="utf-8", newline="\n") as jsonfile:
+        jsonfile.write("{")
+        for column_idx, (colname, values) in enumerate(output_data.items()):
+            if column_idx:
+                jsonfile.write(separator)
+            jsonfile.write(json.dumps(str(colname)) + ":")
+            jsonfile.write(format_json_array(
+                values, separator=separator, precision=precision))
+        jsonfile.write("}")
+
+
+def encode_binary_column(values, time_resolution=BINARY_TIME_RESOLUTION,
+                         time_delta=True):
+    # Datetimes are quantized to the resolution and stored as int64 counts,
+    # or as int32 steps from a start value if delta encoded and they fit
+    if pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.DatetimeIndex(values)
+        if values.tz is not None:
+            values = values.tz_localize(None)
+        resolution_ns = pd.Timedelta(time_resolution).value
+        times = values.asi8 // resolution_ns
+        column_header = {
+            "encoding": "time",
+            "unit_ms": resolution_ns / 1e6,
+            "delta": False,
+            }
+        if time_delta and len(times):
+            time_steps = np.diff(times, prepend=times[0])
+            int32_info = np.iinfo(np.int32)
+            if (time_steps.min() >= int32_info.min
+                    and time_steps.max() <= int32_info.max):
+                column_header.update({"delta": True, "start": int(times[0])})
+                return column_header, time_steps.astype("<i4")
+        return column_header, times.astype("<i8")
+
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        values = np.where(np.isfinite(values), values, np.nan)
+        return {}, values.astype("<f4")
+    if values.dtype.kind in "iub":
+        return {}, values.astype("<i8")
+    raise TypeError(f"Can't write values of dtype {values.dtype} as binary")
+
+
+def write_columnar_binary(output_data, path, **encode_args):
+    # Magic bytes, a uint32 header length and a JSON header listing each
+    # column's dtype and byte offset, then the little-endian column arrays
+    n_rows = None
+    column_headers = []
+    column_buffers = []
+    for colname, values in output_data.items():
+        column_header, column_values = encode_binary_column(
+            values, **encode_args)
+        if n_rows is None:
+            n_rows = len(column_values)
+        elif len(column_values) != n_rows:
+            raise ValueError(
+                f"Column {colname!r} has {len(column_values)} rows, "
+                f"not {n_rows}")
+        column_headers.append({
+            "name": str(colname),
+            "dtype": column_values.dtype.name,
+            **column_header,
+            })
+        column_buffers.append(column_values.tobytes())
+
+    # Offsets depend on the header length, so fill them in until it settles
+    header_length = 0
+    while True:
+        offset = len(BINARY_MAGIC) + 4 + header_length
+        offset += -offset % BINARY_ALIGNMENT
+        for column_header, column_buffer in zip(
+                column_headers, column_buffers):
+            column_header["offset"] = offset
+            offset += len(column_buffer)
+            offset += -offset % BINARY_ALIGNMENT
+        header_bytes = json.dumps(
+            {"version": 1, "n_rows": n_rows or 0, "columns": column_headers},
+            separators=(",", ":"),
+            ).encode("utf-8")
+        if len(header_bytes) == header_length:
+            break
+        header_length = len(header_bytes)
+
+    with open(path, "wb") as binaryfile:
+        binaryfile.write(BINARY_MAGIC)
+        binaryfile.write(len(header_bytes).to_bytes(4, "little"))
+        binaryfile.write(header_bytes)
+        for column_header, column_buffer in zip(
+                column_headers, column_buffers):
+            binaryfile.write(b"\0" * (
+                column_header["offset"] - binaryfile.tell()))
+            binaryfile.write(column_buffer)
+
+
 def write_lastupdate_json(
         path=None,
         lastupdate=None,
@@ -113,49 +360,182 @@ def write_lastupdate_json(
         output_data["lastUpdateSources"] = lastupdate_sources
 
     if path:
-        write_data_json(output_data=output_data, path=path)
+        set_lastupdate_data(path, output_data)
     return output_data
 
 
+@contextlib.contextmanager
+def detect_changes():
+    # Check each input directory and file once and batch lastupdate writes
+    # while active
+    _CHANGE_DETECTION.update({"listings": {}, "mtimes": {}, "pending": {}})
+    try:
+        yield _CHANGE_DETECTION
+    finally:
+        pending_writes = _CHANGE_DETECTION["pending"]
+        _CHANGE_DETECTION.update(
+            {"listings": None, "mtimes": None, "pending": None})
+        for path, lastupdate_data in pending_writes.items():
+            try:
+                write_data_json(output_data=lastupdate_data, path=path)
+            except Exception as error:
+                print(f"Error writing lastupdate file {path}")
+                print(f"{type(error).__name__}: {error}")
+
+
+def get_directory_listing(directory, listings=_DIRECTORY_LISTINGS):
+    # Entry names, only re-listed when the directory's mtime changes. As
+    # mtimes are coarse, listings taken right after a change aren't trusted.
+    directory = Path(directory)
+    cycle_listings = _CHANGE_DETECTION["listings"]
+    if cycle_listings is not None and directory in cycle_listings:
+        return cycle_listings[directory]
+    dir_mtime_ns = directory.stat().st_mtime_ns
+    listing = listings.get(directory, None)
+    if (listing is None or listing["mtime_ns"] != dir_mtime_ns
+            or listing["listed_ns"] - dir_mtime_ns < LISTING_RACY_NS):
+        listing = {
+            "mtime_ns": dir_mtime_ns,
+            "listed_ns": int(time.time() * 10**9),
+            "names": tuple(os.listdir(directory)),
+            }
+        listings[directory] = listing
+    if cycle_listings is not None:
+        cycle_listings[directory] = listing["names"]
+    return listing["names"]
+
+
+def get_mtime_ns(path):
+    # Only stat the files actually checked, once per cycle if detecting
+    path = Path(path)
+    mtimes = _CHANGE_DETECTION["mtimes"]
+    if mtimes is None:
+        return path.stat().st_mtime_ns
+    if path not in mtimes:
+        mtimes[path] = path.stat().st_mtime_ns
+    return mtimes[path]
+
+
+def get_lastupdate_data(path):
+    path = Path(path)
+    if path not in _LASTUPDATE_STATES:
+        try:
+            with open(path, "r", encoding="utf-8", newline="\n") as oldfile:
+                _LASTUPDATE_STATES[path] = json.load(oldfile)
+        except FileNotFoundError:
+            _LASTUPDATE_STATES[path] = None
+    return _LASTUPDATE_STATES[path]
+
+
+def set_lastupdate_data(path, lastupdate_data):
+    path = Path(path)
+    _LASTUPDATE_STATES[path] = lastupdate_data
+    if _CHANGE_DETECTION["pending"] is None:
+        write_data_json(output_data=lastupdate_data, path=path)
+    else:
+        _CHANGE_DETECTION["pending"][path] = lastupdate_data
+
+
+def reset_lastupdate(path=None):
+    # Forget the saved state and remove the file(s) to force a regeneration
+    if path is None:
+        paths = list(_LASTUPDATE_STATES)
+        _LASTUPDATE_STATES.clear()
+    else:
+        paths = [Path(path)]
+        _LASTUPDATE_STATES.pop(paths[0], None)
+    for path in paths:
+        if _CHANGE_DETECTION["pending"] is not None:
+            _CHANGE_DETECTION["pending"].pop(path, None)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
 def check_update(input_path, lastupdate_path):
     if isinstance(input_path, (str, os.PathLike)):
         input_path = {
             sindri.website.preprocess.DEFAULT_SUBPLOT_NAME: input_path}
     current_lastupdate_times = {
-        key: Path(path).stat().st_mtime_ns // 1000000
+        key: get_mtime_ns(path) // 1000000
         for key, path in input_path.items()}
     current_lastupdate = max(current_lastupdate_times.values())
-    if Path(lastupdate_path).exists():
-        with open(lastupdate_path, "r",
-                  encoding="utf-8", newline="\n") as oldfile:
-            old_lastupdate = json.load(oldfile)
+    delta_data = {}
+    old_lastupdate = get_lastupdate_data(lastupdate_path)
+    if old_lastupdate is not None:
+        # Keep the delta sequence until the data is next written
+        delta_data = {
+            key: old_lastupdate[key] for key in DELTA_LASTUPDATE_KEYS
+            if key in old_lastupdate}
         if old_lastupdate["lastUpdateSource"] == current_lastupdate:
             write_lastupdate_json(
                 lastupdate_path,
                 lastupdate=old_lastupdate["lastUpdate"],
                 lastupdate_source=current_lastupdate,
                 lastupdate_sources=current_lastupdate_times,
+                extra_data=delta_data,
                 )
             return False
     write_lastupdate_json(
         path=lastupdate_path,
         lastupdate_source=current_lastupdate,
         lastupdate_sources=current_lastupdate_times,
+        extra_data=delta_data,
         )
     return True
 
 
-def process_tabular_data(
+def _get_time_period_key(time_period):
+    # Treat equivalent fixed periods (e.g. "24H" and "1D") as the same
+    if not time_period:
+        return None
+    offset = pd.tseries.frequencies.to_offset(time_period)
+    if isinstance(offset, pd.tseries.offsets.Tick):
+        return offset.nanos
+    return offset.freqstr
+
+
+def get_tabular_cache_key(
+        time_period=None, decimate=None, drop_cols=None, col_conversions=None):
+    return (
+        _get_time_period_key(time_period),
+        decimate if decimate and decimate > 1 else None,
+        tuple(sorted(drop_cols)) if drop_cols else None,
+        tuple(sorted(
+            (var_name, tuple(conversion))
+            for var_name, conversion in col_conversions.items()))
+        if col_conversions else None,
+        )
+
+
+@contextlib.contextmanager
+def cache_tabular_data(report=None):
+    # Share intermediate data between blocks processed while active
+    if report is None:
+        report = sindri.config.website.REPORT_DATA_CACHE_STATS
+    _TABULAR_DATA_CACHE.update({"frames": {}, "hits": 0, "misses": 0})
+    try:
+        yield _TABULAR_DATA_CACHE
+    finally:
+        _TABULAR_DATA_CACHE["frames"] = None
+        if report:
+            print("Tabular data cache: "
+                  f"{_TABULAR_DATA_CACHE['hits']} hits, "
+                  f"{_TABULAR_DATA_CACHE['misses']} misses")
+
+
+def select_tabular_data(
         full_data,
-        time_period=None, drop_cols=None, decimate=None,
-        col_conversions=None, preprocess_fn=None,
-        output_cols=None, sort_rows=False,
-        round_floats=None, reset_index=False, index_postprocess=False,
-        final_colnames=None, reverse_output=False
+        time_period=None, drop_cols=None, decimate=None, col_conversions=None,
         ):
     if time_period:
         full_data = full_data.last(time_period)
     full_data = full_data.copy()
+    # Restore the datetime column if it is only stored as the index
+    if (full_data.index.name is not None
+            and full_data.index.name not in full_data.columns):
+        full_data.insert(0, full_data.index.name, full_data.index)
     if decimate and decimate > 1:
         full_data = full_data.iloc[::decimate, :]
     if drop_cols:
@@ -164,6 +544,41 @@ def process_tabular_data(
     if col_conversions:
         for var_name, (factor, n_digits) in col_conversions.items():
             full_data[var_name] = round(full_data[var_name] * factor, n_digits)
+    return full_data
+
+
+def process_tabular_data(
+        full_data,
+        time_period=None, drop_cols=None, decimate=None,
+        col_conversions=None, preprocess_fn=None,
+        output_cols=None, sort_rows=False,
+        round_floats=None, reset_index=False, index_postprocess=False,
+        final_colnames=None, reverse_output=False
+        ):
+    select_args = {
+        "time_period": time_period,
+        "drop_cols": drop_cols,
+        "decimate": decimate,
+        "col_conversions": col_conversions,
+        }
+    cached_frames = _TABULAR_DATA_CACHE["frames"]
+    if cached_frames is None:
+        full_data = select_tabular_data(full_data, **select_args)
+    else:
+        # Keep the source data in the entry so its id can't be reused
+        cache_key = (id(full_data), get_tabular_cache_key(**select_args))
+        cache_entry = cached_frames.get(cache_key, None)
+        if cache_entry is not None and cache_entry[0] is full_data:
+            _TABULAR_DATA_CACHE["hits"] += 1
+        else:
+            _TABULAR_DATA_CACHE["misses"] += 1
+            cache_entry = (
+                full_data, select_tabular_data(full_data, **select_args))
+            cached_frames[cache_key] = cache_entry
+        full_data = cache_entry[1]
+        # The shared data must not be modified by the steps below
+        if preprocess_fn or output_cols is None:
+            full_data = full_data.copy()
 
     if preprocess_fn:
         full_data = preprocess_fn(full_data)
@@ -195,13 +610,56 @@ def process_tabular_data(
     return output_data
 
 
-def get_dashboard_plot_data(full_data, plot_type, plot_data):
-    if not plot_type:
-        return None
+def get_dashboard_reducer(threshold_type):
+    # Look up a registered reducer, or a percentile given as e.g. "p95"
+    reducer = DASHBOARD_REDUCERS.get(threshold_type, None)
+    if reducer is None and isinstance(threshold_type, str):
+        percentile_match = re.fullmatch(
+            DASHBOARD_PERCENTILE_PATTERN, threshold_type)
+        if percentile_match:
+            reducer = functools.partial(
+                np.nanpercentile, q=float(percentile_match.group(1)))
+    return reducer
+
+
+def is_dashboard_plot_batchable(plot_type, plot_data):
+    # Only default data/overlay functions with a named variable are batched
+    return (
+        plot_type == "numeric"
+        and isinstance(plot_data.get("variable", None), str)
+        and "data_functions" not in plot_data
+        and "overlay_functions" not in plot_data
+        and get_dashboard_reducer(
+            plot_data.get("threshold_type", None)) is not None
+        )
+
 
+def bind_dashboard_data_args(plot_type, plot_data):
     data_args = copy.deepcopy(DASHBOARD_DATA_ARGS_DEFAULT)
     data_args.update(**plot_data)
 
+    if plot_type == "numeric" and data_args["threshold_type"]:
+        reducer = get_dashboard_reducer(data_args["threshold_type"])
+        if reducer is None:
+            raise ValueError(
+                "Either overlay_functions must be defined or "
+                "threshold_type must be one of "
+                f"{{{', '.join(map(repr, DASHBOARD_REDUCERS))}, 'p<N>'}} "
+                "with plot_type 'numeric', not "
+                + str(data_args['threshold_type'])
+                )
+        data_args["overlay_functions"][2] = (
+            lambda val: reducer(np.asarray(val, dtype=np.float64)))
+    return data_args
+
+
+def get_dashboard_plot_data(full_data, plot_type, plot_data, data_args=None):
+    if not plot_type:
+        return None
+
+    if data_args is None:
+        data_args = bind_dashboard_data_args(plot_type, plot_data)
+
     if data_args.get("unit_id", None) is not None:
         try:
             full_data = full_data[data_args["unit_id"]]
@@ -215,22 +673,6 @@ def get_dashboard_plot_data(full_data, plot_type, plot_data):
         else:
             base_data = full_data.loc[:, data_args["variable"]]
 
-        if data_args["threshold_type"]:
-            if data_args["threshold_type"] == "min":
-                data_args["overlay_functions"][2] = lambda val: min(val)
-            elif data_args["threshold_type"] == "max":
-                data_args["overlay_functions"][2] = lambda val: max(val)
-            elif data_args["threshold_type"] == "mean":
-                data_args["overlay_functions"][2] = (
-                    lambda val: sum(val) / len(val))
-            else:
-                raise ValueError(
-                    "Either overlay_functions must be defined or "
-                    "threshold_type must be one of {'min', 'max', 'mean'} "
-                    "with plot_type 'numeric', not "
-                    + str(data_args['threshold_type'])
-                    )
-
     elif plot_type == "custom":
         base_data = full_data
     else:
@@ -245,20 +687,147 @@ def get_dashboard_plot_data(full_data, plot_type, plot_data):
     return plot_data
 
 
+def is_fixed_period(time_period):
+    return isinstance(
+        pd.tseries.frequencies.to_offset(time_period),
+        pd.tseries.offsets.Tick,
+        )
+
+
+def get_dashboard_rolling_window(
+        unit_data, unit_id, variable, time_period,
+        rolling_windows=_DASHBOARD_ROLLING_WINDOWS):
+    window_key = (unit_id, variable, pd.Timedelta(time_period).value)
+    rolling_window = rolling_windows.get(window_key, None)
+    if rolling_window is None:
+        rolling_window = sindri.utils.rolling.RollingWindow(time_period)
+        rolling_windows[window_key] = rolling_window
+    rolling_window.update(unit_data.index.asi8, unit_data[variable])
+    return rolling_window
+
+
+def _get_dashboard_group_data(
+        unit_data, delta_period, threshold_period, group_args,
+        unit_id=None, rolling=None):
+    if rolling is None:
+        rolling = sindri.config.website.DASHBOARD_ROLLING_AGGREGATES
+    # Rolling windows need fixed-length periods, not e.g. calendar months
+    rolling = rolling and (
+        is_fixed_period(delta_period) and is_fixed_period(threshold_period))
+
+    batch_args = {
+        plot_key: data_args for plot_key, data_args in group_args.items()
+        if not rolling
+        or data_args["threshold_type"] not in DASHBOARD_ROLLING_REDUCERS}
+    variables = list(dict.fromkeys(
+        data_args["variable"] for data_args in batch_args.values()))
+    threshold_results = {}
+    if variables:
+        threshold_values = (
+            unit_data[variables].last(threshold_period)
+            .to_numpy(dtype=np.float64))
+    for threshold_type in {
+            data_args["threshold_type"] for data_args in batch_args.values()}:
+        reducer = get_dashboard_reducer(threshold_type)
+        threshold_results[threshold_type] = dict(
+            zip(variables, reducer(threshold_values, axis=0)))
+    if not rolling:
+        delta_start = len(unit_data) - len(unit_data.last(delta_period))
+
+    group_data = {}
+    for plot_key, data_args in group_args.items():
+        variable = data_args["variable"]
+        variable_data = unit_data[variable]
+        if rolling:
+            delta_value = get_dashboard_rolling_window(
+                unit_data, unit_id, variable, delta_period).first()
+        else:
+            delta_value = variable_data.iat[delta_start]
+        if plot_key in batch_args:
+            threshold_value = threshold_results[
+                data_args["threshold_type"]][variable]
+        else:
+            threshold_window = get_dashboard_rolling_window(
+                unit_data, unit_id, variable, threshold_period)
+            threshold_value = getattr(
+                threshold_window, data_args["threshold_type"])()
+        group_data[plot_key] = tuple(safe_nan(value) for value in (
+            variable_data.iat[-1], delta_value, threshold_value))
+    return group_data
+
+
+def get_dashboard_plot_data_batch(full_data, plots_data):
+    # Compute the values for many numeric plots sharing each data window
+    plot_groups = {}
+    for plot_key, plot_data in plots_data.items():
+        data_args = {**DASHBOARD_DATA_ARGS_DEFAULT, **plot_data}
+        group_key = (
+            data_args.get("unit_id", None),
+            data_args["delta_period"],
+            data_args["threshold_period"],
+            )
+        plot_groups.setdefault(group_key, {})[plot_key] = data_args
+
+    batch_results = {}
+    for group_key, group_args in plot_groups.items():
+        unit_id, delta_period, threshold_period = group_key
+        if unit_id is None:
+            unit_data = full_data
+        else:
+            try:
+                unit_data = full_data[unit_id]
+            except KeyError:
+                for __ in group_args:
+                    print(f"Unit {unit_id} data not found; skipping")
+                batch_results.update(
+                    {plot_key: [None] * 3 for plot_key in group_args})
+                continue
+        # Plots in groups that fail are left to be computed individually
+        try:
+            batch_results.update(_get_dashboard_group_data(
+                unit_data, delta_period, threshold_period, group_args,
+                unit_id=unit_id))
+        except Exception as error:
+            print("Error batching data for dashboard plots "
+                  f"{list(group_args)}; computing them individually")
+            print(f"{type(error).__name__}: {error}")
+    return batch_results
+
+
 def generate_dashboard_data(
-        full_data, dashboard_plots, output_path=None):
+        full_data, dashboard_plots, output_path=None, dashboard_subplots=None):
+    if dashboard_subplots is None:
+        all_subplots = {
+            plot_id: sindri.website.preprocess.preprocess_subplots(plot)
+            for plot_id, plot in dashboard_plots.items()}
+    else:
+        all_subplots = dashboard_subplots
+
+    batch_plots_data = {
+        (plot_id, subplot_id): subplot_params["plot_data"]
+        for plot_id, subplots in all_subplots.items()
+        for subplot_id, subplot_params in subplots.items()
+        if is_dashboard_plot_batchable(
+            subplot_params["plot_type"], subplot_params["plot_data"])}
+    batch_results = get_dashboard_plot_data_batch(
+        full_data, batch_plots_data)
+
     dashboard_data = {}
-    for plot_id, plot in dashboard_plots.items():
-        subplots = sindri.website.preprocess.preprocess_subplots(plot)
+    for plot_id, subplots in all_subplots.items():
         plot_data = {}
         for subplot_id, subplot_params in subplots.items():
             if not subplot_params["plot_type"]:
                 continue
+            subplot_data = batch_results.get((plot_id, subplot_id), None)
+            if subplot_data is not None:
+                plot_data[subplot_id] = subplot_data
+                continue
             try:
                 subplot_data = get_dashboard_plot_data(
                     full_data,
                     plot_type=subplot_params["plot_type"],
                     plot_data=subplot_params["plot_data"],
+                    data_args=subplot_params.get("data_args", None),
                     )
             except Exception as error:
                 print("Error generating data for dashboard plot",
@@ -271,6 +840,7 @@ def generate_dashboard_data(
 
     if dashboard_data and output_path:
         write_data_json(output_data=dashboard_data, path=output_path)
+        write_compressed_files(output_path)
     return dashboard_data
 
 
@@ -286,6 +856,7 @@ def generate_table_data(
             output_args = {}
         table_data.to_json(
             output_path, orient="records", lines=False, **output_args)
+        write_compressed_files(output_path)
     return table_data
 
 
@@ -300,6 +871,7 @@ def generate_text_data(
         output_path_full = output_path
     if output_path_full is not None:
         shutil.copy(input_path, output_path_full)
+        write_compressed_files(output_path_full)
 
     if output_path is None or output_path != output_path_full:
         with open(input_path, "r", encoding="utf8", newline="\n") as in_file:
@@ -311,33 +883,161 @@ def generate_text_data(
             with open(output_path, "w",
                       encoding="utf8", newline="\n") as out_file:
                 out_file.write(text_content)
+            write_compressed_files(output_path)
         return text_content
 
     return None
 
 
+def write_plot_output(
+        plot_data, output_path, index_converter=None, float_precision=None,
+        time_resolution=BINARY_TIME_RESOLUTION, time_delta=True):
+    write_binary = Path(output_path).suffix == f".{BINARY_EXTENSION}"
+    plot_data_output = {
+        colname: plot_data.iloc[:, col_idx].to_numpy()
+        for col_idx, colname in enumerate(plot_data.columns)}
+    if plot_data.index.name:
+        index_name = plot_data.index.name
+    else:
+        index_name = "index"
+    if index_converter is None:
+        plot_data_output[index_name] = plot_data.index
+    elif write_binary and pd.api.types.is_datetime64_any_dtype(
+            plot_data.index):
+        # Binary output encodes datetimes itself, so converted values (e.g.
+        # local time strings) are parsed back to show the same axis as JSON
+        try:
+            plot_data_output[index_name] = pd.DatetimeIndex(
+                pd.to_datetime(index_converter(plot_data.index)))
+        except (TypeError, ValueError) as error:
+            raise ValueError(
+                "index_converter must return datetimes or datetime strings "
+                f"for binary plot output to {output_path}") from error
+    else:
+        plot_data_output[index_name] = np.asarray(
+            index_converter(plot_data.index))
+    if write_binary:
+        write_columnar_binary(
+            plot_data_output, output_path,
+            time_resolution=time_resolution, time_delta=time_delta)
+    else:
+        write_columnar_json(plot_data_output, output_path, by_line=True,
+                            precision=float_precision)
+    write_compressed_files(output_path)
+
+
+def get_delta_path(output_path, base, sequence):
+    output_path = Path(output_path)
+    return output_path.with_name(DELTA_FILENAME.format(
+        stem=output_path.stem,
+        base=base,
+        sequence=sequence,
+        suffix=output_path.suffix,
+        ))
+
+
+def remove_delta_files(output_path, keep_base=None):
+    output_path = Path(output_path)
+    delta_pattern = re.compile(
+        rf"{re.escape(output_path.stem)}_(\d+)_\d+"
+        rf"{re.escape(output_path.suffix)}")
+    with os.scandir(output_path.parent) as entries:
+        for entry in entries:
+            delta_match = delta_pattern.fullmatch(entry.name)
+            if delta_match and int(delta_match.group(1)) != keep_base:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def write_plot_delta(
+        plot_data, output_path, lastupdate_path,
+        time_period=None, max_chunks=DELTA_MAX_CHUNKS, **output_args):
+    # Write the rows added since the last cycle as a numbered chunk after
+    # the base snapshot, starting a new base every max_chunks chunks
+    output_path = Path(output_path)
+    state = _PLOT_DELTA_STATES.get(output_path, None)
+    lastupdate_data = dict(get_lastupdate_data(lastupdate_path) or {})
+    last_time = plot_data.index[-1] if len(plot_data) else None
+    if (state is None or last_time is None or state["last_time"] is None
+            or last_time < state["last_time"]
+            or state["columns"] != list(plot_data.columns)
+            or state["sequence"] >= max_chunks):
+        # After a restart, chunks can't be continued, so start a new base
+        # after the one clients last saw
+        if state is None:
+            last_base = lastupdate_data.get("deltaBase", None) or 0
+        else:
+            last_base = state["base"]
+        base = max(int(time.time() * 1000), last_base + 1)
+        state = {
+            "base": base, "sequence": 0, "columns": list(plot_data.columns)}
+        write_plot_output(
+            plot_data, get_delta_path(output_path, base, 0), **output_args)
+        remove_delta_files(output_path, keep_base=base)
+    else:
+        new_data = plot_data.loc[plot_data.index > state["last_time"]]
+        if len(new_data):
+            state["sequence"] += 1
+            write_plot_output(
+                new_data,
+                get_delta_path(output_path, state["base"], state["sequence"]),
+                **output_args,
+                )
+    state["last_time"] = last_time
+    _PLOT_DELTA_STATES[output_path] = state
+
+    time_period_key = _get_time_period_key(time_period)
+    lastupdate_data.update({
+        "deltaBase": state["base"],
+        "deltaSequence": state["sequence"],
+        "deltaWindow": (time_period_key // 1000000
+                        if isinstance(time_period_key, int) else None),
+        })
+    set_lastupdate_data(lastupdate_path, lastupdate_data)
+
+
+def clear_plot_delta(output_path, lastupdate_path):
+    # Stop clients loading deltas once they're turned off
+    _PLOT_DELTA_STATES.pop(Path(output_path), None)
+    lastupdate_data = get_lastupdate_data(lastupdate_path)
+    if lastupdate_data and any(
+            key in lastupdate_data for key in DELTA_LASTUPDATE_KEYS):
+        set_lastupdate_data(lastupdate_path, {
+            key: value for key, value in lastupdate_data.items()
+            if key not in DELTA_LASTUPDATE_KEYS})
+        remove_delta_files(output_path)
+
+
 def generate_plot_data(
         full_data, plot_subplots=None, index_converter=None, output_path=None,
-        **table_process_args):
+        float_precision=None, time_resolution=BINARY_TIME_RESOLUTION,
+        time_delta=True, delta=False, delta_max_chunks=DELTA_MAX_CHUNKS,
+        lastupdate_path=None, **table_process_args):
 
     plot_data = process_tabular_data(
         full_data=full_data, output_cols=list(plot_subplots.keys()),
         **table_process_args)
 
     if output_path:
-        plot_data_json = (
-            plot_data.where(np.isfinite(plot_data), None)
-            .replace({np.nan: None})
-            .to_dict(orient="list"))
-        if plot_data.index.name:
-            index_name = plot_data.index.name
-        else:
-            index_name = "index"
-        if index_converter is None:
-            plot_data_json[index_name] = list(plot_data.index)
-        else:
-            plot_data_json[index_name] = list(index_converter(plot_data.index))
-        write_data_json(plot_data_json, output_path, by_line=True)
+        output_args = {
+            "index_converter": index_converter,
+            "float_precision": float_precision,
+            "time_resolution": time_resolution,
+            "time_delta": time_delta,
+            }
+        # The full file is still written for downloads and query pages
+        write_plot_output(plot_data, output_path, **output_args)
+        if delta and lastupdate_path:
+            write_plot_delta(
+                plot_data, output_path, lastupdate_path,
+                time_period=table_process_args.get("time_period", None),
+                max_chunks=delta_max_chunks,
+                **output_args,
+                )
+        elif lastupdate_path:
+            clear_plot_delta(output_path, lastupdate_path)
     return plot_data
 
 
@@ -349,8 +1049,16 @@ def process_input_path(input_path):
 
     # Handle input path if it is a glob
     if "*" in input_path.stem or "?" in input_path.stem:
-        input_path = Path(list(
-            input_path.parents[0].glob(input_path.stem))[0])
+        if _CHANGE_DETECTION["listings"] is None:
+            input_path = Path(list(
+                input_path.parents[0].glob(input_path.stem))[0])
+        else:
+            entry_names = get_directory_listing(input_path.parents[0])
+            if not input_path.stem.startswith("."):
+                entry_names = [
+                    name for name in entry_names if not name.startswith(".")]
+            input_path = input_path.parents[0] / fnmatch.filter(
+                entry_names, input_path.stem)[0]
     return input_path
 
 
@@ -367,7 +1075,8 @@ def generate_singlepage_data(
         if block["type"] == "generic":
             continue
 
-        data_args = copy.deepcopy(block["args"]["data_args"])
+        block = compile_block(section_id, block)
+        data_args = block["args"]["data_args"]
         input_path = data_args.get("input_path", input_path_default)
 
         if isinstance(input_path, (str, os.PathLike)):
@@ -379,23 +1088,23 @@ def generate_singlepage_data(
 
         if input_path is not None and output_path is not None:
             update_needed = check_update(
-                input_path,
-                output_path / (LASTUPDATE_FILENAME.format(
-                    section_id=section_id)),
-                )
+                input_path, output_path / block["lastupdate_path"])
             if not update_needed:
                 continue
 
+        # Only the per-cycle paths are set; the compiled args aren't copied
+        cycle_args = {"output_path": output_path / block["data_filename"]}
         if data_args.get("input_path", None) is not None:
-            data_args["input_path"] = input_path
-        if data_args.get("output_path", None) is None:
-            data_args["output_path"] = DATA_FILENAME.format(
-                section_id=section_id, extension=DEFAULT_EXTENSION)
-        for data_arg in ("output_path", "output_path_full"):
-            if data_args.get(data_arg, None) is not None:
-                data_args[data_arg] = output_path / data_args[data_arg]
+            cycle_args["input_path"] = input_path
+        if data_args.get("output_path_full", None) is not None:
+            cycle_args["output_path_full"] = (
+                output_path / data_args["output_path_full"])
+        if "delta" in data_args:
+            cycle_args["lastupdate_path"] = (
+                output_path / block["lastupdate_path"])
 
-        data_function_map[block["type"]](full_data=full_data, **data_args)
+        data_function_map[block["type"]](
+            full_data=full_data, **{**data_args, **cycle_args})
 
 
 def generate_daily_data(
@@ -428,16 +1137,80 @@ def generate_daily_data(
         filename = filename_template.format(group.date())
         group_data.to_csv(output_path / filename, line_terminator="\n",
                           **output_args)
+        write_compressed_files(output_path / filename)
+
+
+def get_ingest_columns(content_pages, mode="test"):
+    if not sindri.config.website.INGEST_PROJECT_COLUMNS:
+        return None
+    if mode == "server":
+        column_specs = sindri.config.website.CALCULATED_COLUMNS_SERVER
+    else:
+        column_specs = sindri.config.website.CALCULATED_COLUMNS
+    return sindri.website.preprocess.get_required_columns(
+        content_pages, column_specs=column_specs)
+
+
+def ingest_site_data(mode="test", usecols=None, changed_dirs=None):
+    # Only ingest data for the units whose data directories changed, if
+    # known, reusing the last update's data for the rest
+    last_ingest = _INGESTED_DATA.get(mode, None)
+    if (changed_dirs is None or last_ingest is None
+            or last_ingest["usecols"] != usecols):
+        changed_dirs = None
+    else:
+        changed_dirs = {Path(data_dir) for data_dir in changed_dirs}
 
+    if mode == "server":
+        unit_dirs = [
+            unit_dir for unit_dir in sindri.config.website.UNIT_DIRS_SERVER
+            if changed_dirs is None or (
+                Path(sindri.config.website.DATA_DIR_SERVER) / unit_dir
+                / sindri.config.website.DATA_SUBDIR_SERVER) in changed_dirs]
+        if changed_dirs is None:
+            full_data = {}
+        else:
+            changed_units = {Path(unit_dir).stem for unit_dir in unit_dirs}
+            full_data = {
+                unit: status_data
+                for unit, status_data in last_ingest["data"].items()
+                if unit not in changed_units}
+        if unit_dirs:
+            full_data.update(sindri.process.ingest_status_data_server(
+                n_days=7, unit_dirs=unit_dirs, usecols=usecols))
+    elif changed_dirs is None or (
+            Path(sindri.config.website.DATA_DIR_CLIENT) in changed_dirs):
+        full_data = sindri.process.ingest_status_data_client(
+            n_days=30, usecols=usecols)
+    else:
+        full_data = last_ingest["data"]
+
+    _INGESTED_DATA[mode] = {"usecols": usecols, "data": full_data}
+    return full_data
+
+
+def generate_site_data(
+        content_pages, project_path=None, mode="test", changed_dirs=None):
+    content_pages = compile_content_pages(content_pages)
+    with cache_tabular_data(), detect_changes():
+        _generate_site_data(
+            content_pages,
+            project_path=project_path,
+            mode=mode,
+            changed_dirs=changed_dirs,
+            )
 
-def generate_site_data(content_pages, project_path=None, mode="test"):
+
+def _generate_site_data(
+        content_pages, project_path=None, mode="test", changed_dirs=None):
+    usecols = get_ingest_columns(content_pages, mode=mode)
+    full_data = ingest_site_data(
+        mode=mode, usecols=usecols, changed_dirs=changed_dirs)
     if mode == "server":
-        full_data = sindri.process.ingest_status_data_server(n_days=7)
         input_paths = sindri.process.get_status_data_paths_bykey(n_days=1)
         input_path_default = {
             key: paths[0] for key, paths in input_paths.items()}
     else:
-        full_data = sindri.process.ingest_status_data_client(n_days=30)
         input_path_default = sindri.process.get_status_data_paths(n_days=1)[0]
 
     if project_path:
@@ -533,6 +1306,16 @@ def generate_dynamic_block(
     return dynamic_block
 
 
+def get_dashboard_subplot_layout(subplot_params, layout_map=None, color_map=None):
+    layout_args = lookup_in_map(
+        subplot_params["plot_data"].get("variable", None), layout_map)
+    layout_args["tick0"] = layout_args.get(
+        "range", subplot_params.get("range", None))[0]
+    steps = generate_steps(
+        subplot_params, subplot_params["plot_data"], color_map)
+    return layout_args, steps
+
+
 def generate_dashboard_block(
         block_metadata, section_id, data_args,
         data_path, lastupdate_path,
@@ -543,16 +1326,19 @@ def generate_dashboard_block(
     widget_blocks = []
     all_plots = []
     fast_update_plots = {}
+    dashboard_subplots = data_args.get("dashboard_subplots", None)
     for plot_id, plot in data_args["dashboard_plots"].items():
-        subplots = sindri.website.preprocess.preprocess_subplots(plot)
+        if dashboard_subplots is None:
+            subplots = sindri.website.preprocess.preprocess_subplots(plot)
+        else:
+            subplots = dashboard_subplots[plot_id]
         subplot_setup = []
         for idx, subplot_params in enumerate(subplots.values()):
-            layout_args = lookup_in_map(
-                subplot_params["plot_data"].get("variable", None), layout_map)
-            layout_args["tick0"] = layout_args.get(
-                "range", subplot_params.get("range", None))[0]
-            subplot_params["steps"] = generate_steps(
-                subplot_params, subplot_params["plot_data"], color_map)
+            layout_args = subplot_params.get("layout_args", None)
+            if layout_args is None:
+                layout_args, steps = get_dashboard_subplot_layout(
+                    subplot_params, layout_map=layout_map, color_map=color_map)
+                subplot_params = {**subplot_params, "steps": steps}
 
             subplot_setup.append(
                 sindri.website.templates.DASHBOARD_SUBPLOT_TEMPLATE.format(
@@ -669,7 +1455,7 @@ def generate_plot_block(
         block_metadata, section_id, data_args, content_args,
         data_path, lastupdate_path,
         name_map=None, layout_map=None, color_map=None,
-        extension=DEFAULT_EXTENSION,
+        extension=DEFAULT_EXTENSION, data_filename=None,
         update_interval_seconds=STATUS_UPDATE_INTERVAL_SLOW_SECONDS,
         ):
     idx_strings = []
@@ -677,7 +1463,10 @@ def generate_plot_block(
     yaxis_items = []
     shape_items = []
     data_path = Path(data_path).stem
-    content_args["alert_on_fail"] = str(content_args["alert_on_fail"]).lower()
+    content_args = {
+        **content_args,
+        "alert_on_fail": str(content_args["alert_on_fail"]).lower(),
+        }
 
     for idx, subplot_variable in enumerate(data_args["plot_subplots"]):
         idx_string = str(idx + 1) if idx else ""
@@ -719,6 +1508,25 @@ def generate_plot_block(
                 )
             shape_items = shape_items + list(shape_strings)
 
+    if extension == BINARY_EXTENSION:
+        data_loader = "loadColumnarBinary"
+    else:
+        data_loader = f"Plotly.d3.{extension}"
+
+    # Deltas are named and formatted like the file the server writes them
+    # from, which isn't the data_path file for e.g. CSV downloads
+    if data_filename is None:
+        data_filename = f"{data_path}.{extension}"
+    delta_path = get_delta_path(
+        Path(data_filename).name,
+        base='" + base + "',
+        sequence='" + sequence + "',
+        )
+    if delta_path.suffix == f".{BINARY_EXTENSION}":
+        delta_loader = "loadColumnarBinary"
+    else:
+        delta_loader = f"Plotly.d3.{delta_path.suffix.lstrip('.')}"
+
     plot_content = sindri.website.templates.PLOT_CONTENT_TEMPLATE.format(
         section_id=section_id,
         sub_plots="\n".join(subplot_items),
@@ -726,6 +1534,9 @@ def generate_plot_block(
         y_axes="\n".join(yaxis_items),
         shape_list="\n".join(shape_items),
         data_path=data_path,
+        data_loader=data_loader,
+        delta_path=delta_path.as_posix(),
+        delta_loader=delta_loader,
         extension=extension,
         lastupdate_path=lastupdate_path,
         update_interval_seconds=update_interval_seconds,
@@ -753,25 +1564,12 @@ def generate_singlepage_content(page_blocks):
         }
 
     for section_id, block in page_blocks.items():
-        if block["args"]["data_args"].get("output_path", None) is None:
-            extension = block["args"].get("extension", DEFAULT_EXTENSION)
-            data_path = DATA_FILENAME.format(
-                section_id=section_id, extension=extension)
-        else:
-            data_path = block["args"]["data_args"]["output_path"]
-        lastupdate_path = LASTUPDATE_FILENAME.format(section_id=section_id)
-
-        if block["metadata"].get("button_link", None) is True:
-            block["metadata"]["button_link"] = data_path
-        if block["metadata"].get("button_newtab", None) is not None:
-            block["metadata"]["button_newtab"] = str(
-                block["metadata"]["button_newtab"]).lower()
-
+        block = compile_block(section_id, block)
         rendered_block = block_function_map[block["type"]](
             block_metadata=block["metadata"],
             section_id=section_id,
-            data_path=data_path,
-            lastupdate_path=lastupdate_path,
+            data_path=block["data_path"],
+            lastupdate_path=block["lastupdate_path"],
             **block["args"],
             )
         rendered_blocks.append(rendered_block)
@@ -833,6 +1631,7 @@ def generate_build_info(project_path=None, output_path=BUILDINFO_DATABAG_PATH):
 
 
 def generate_site_content(content_pages, project_path=None):
+    content_pages = compile_content_pages(content_pages)
     if project_path is None:
         project_path = Path()
     else:
@@ -874,3 +1673,201 @@ def generate_and_write_site_content(content_pages, project_path=None):
     write_site_content(
         page_contents, project_path=project_path)
     return page_contents
+
+
+def compile_dashboard_subplots(dashboard_plots, layout_map=None, color_map=None):
+    dashboard_subplots = {}
+    for plot_id, plot in dashboard_plots.items():
+        subplots = {}
+        for subplot_id, subplot_params in (
+                sindri.website.preprocess.preprocess_subplots(plot).items()):
+            # Leave anything invalid to raise when it is actually used
+            if subplot_params["plot_type"]:
+                try:
+                    subplot_params["data_args"] = bind_dashboard_data_args(
+                        subplot_params["plot_type"],
+                        subplot_params["plot_data"],
+                        )
+                except Exception:
+                    pass
+            try:
+                layout_args, steps = get_dashboard_subplot_layout(
+                    subplot_params, layout_map=layout_map, color_map=color_map)
+            except Exception:
+                pass
+            else:
+                subplot_params["layout_args"] = layout_args
+                subplot_params["steps"] = steps
+            subplots[subplot_id] = types.MappingProxyType(subplot_params)
+        dashboard_subplots[plot_id] = types.MappingProxyType(subplots)
+    return types.MappingProxyType(dashboard_subplots)
+
+
+def compile_block(section_id, block):
+    # Resolve a block's paths, metadata and subplots ahead of time, on a
+    # private copy so nothing nested is shared with the global config
+    if isinstance(block, types.MappingProxyType):
+        return block
+    block = copy.deepcopy(block)
+    block_args = dict(block["args"])
+    data_args = dict(block_args["data_args"])
+
+    data_filename = data_args.get("output_path", None)
+    if data_filename is None:
+        extension = block_args.get("extension", DEFAULT_EXTENSION)
+        data_filename = DATA_FILENAME.format(
+            section_id=section_id,
+            extension=(extension if extension == BINARY_EXTENSION
+                       else DEFAULT_EXTENSION),
+            )
+        data_path = DATA_FILENAME.format(
+            section_id=section_id, extension=extension)
+    else:
+        data_path = data_filename
+
+    metadata = dict(block["metadata"])
+    if metadata.get("button_link", None) is True:
+        metadata["button_link"] = data_path
+    if metadata.get("button_newtab", None) is not None:
+        metadata["button_newtab"] = str(metadata["button_newtab"]).lower()
+
+    if block["type"] == "plot":
+        block_args["data_filename"] = data_filename
+        # Decimation restarts from each cycle's first row, so chunks
+        # wouldn't line up with the rows clients already have
+        if data_args.get("delta", False) and (
+                data_args.get("decimate", None) or 1) > 1:
+            print(f"Plot deltas can't be used with decimation; "
+                  f"disabling them for section {section_id!r}")
+            data_args["delta"] = False
+    if block["type"] == "dashboard":
+        data_args["dashboard_subplots"] = compile_dashboard_subplots(
+            data_args["dashboard_plots"],
+            layout_map=block_args.get("layout_map", None),
+            color_map=block_args.get("color_map", None),
+            )
+    block_args["data_args"] = types.MappingProxyType(data_args)
+
+    return types.MappingProxyType({
+        **block,
+        "args": types.MappingProxyType(block_args),
+        "metadata": types.MappingProxyType(metadata),
+        "data_filename": data_filename,
+        "data_path": data_path,
+        "lastupdate_path": LASTUPDATE_FILENAME.format(section_id=section_id),
+        })
+
+
+def compile_content_pages(content_pages):
+    # Build a plan of the content config, copied once here so update cycles
+    # can use it directly instead of copying and reprocessing it each time;
+    # its mappings are read-only, and nested values must not be mutated
+    if isinstance(content_pages, types.MappingProxyType):
+        return content_pages
+    content_plan = {}
+    for path, page in content_pages.items():
+        page = {key: (value if key == "blocks" else copy.deepcopy(value))
+                for key, value in page.items()}
+        if page.get("args", None) is not None:
+            page["args"] = types.MappingProxyType(page["args"])
+        if page.get("blocks", None) is not None:
+            page["blocks"] = types.MappingProxyType({
+                section_id: compile_block(section_id, block)
+                for section_id, block in page["blocks"].items()})
+        content_plan[path] = types.MappingProxyType(page)
+    return types.MappingProxyType(content_plan)
+
+
+def get_content_plan(mode="test", content_plans=_CONTENT_PLANS):
+    # Compile each mode's config once, and again only if it is reloaded
+    content_pages = sindri.config.website.get_content_config(
+        mode=mode, deepcopy=False)
+    source_pages, content_plan = content_plans.get(mode, (None, None))
+    if source_pages is not content_pages:
+        content_plan = compile_content_pages(content_pages)
+        content_plans[mode] = (content_pages, content_plan)
+    return content_plan
+
+
+def _get_cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:  # Cell not yet assigned
+        return None
+
+
+def _get_global_names(code):
+    # Names a function (and any nested in it) may look up as globals
+    global_names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            global_names |= _get_global_names(const)
+    return global_names
+
+
+def get_config_fingerprint(value, _seen=None):
+    # Comparable summary of a config value, with functions compared by code
+    # so reloading an unchanged config gives the same fingerprint
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return ("recursive", type(value).__name__)
+    if isinstance(value, (dict, types.MappingProxyType)):
+        _seen = _seen | {id(value)}
+        return ("mapping", tuple(
+            (repr(key), get_config_fingerprint(item, _seen))
+            for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        _seen = _seen | {id(value)}
+        return (type(value).__name__, tuple(
+            get_config_fingerprint(item, _seen) for item in value))
+    if isinstance(value, functools.partial):
+        _seen = _seen | {id(value)}
+        return ("partial", get_config_fingerprint(
+            (value.func, value.args, value.keywords), _seen))
+    if isinstance(value, types.FunctionType):
+        _seen = _seen | {id(value)}
+        closure_values = tuple(
+            _get_cell_contents(cell) for cell in (value.__closure__ or ()))
+        global_values = {
+            name: value.__globals__[name]
+            for name in sorted(_get_global_names(value.__code__))
+            if name in value.__globals__}
+        return ("function", get_config_fingerprint(value.__code__, _seen),
+                get_config_fingerprint(
+                    (value.__defaults__, value.__kwdefaults__,
+                     closure_values, global_values),
+                    _seen))
+    if isinstance(value, types.CodeType):
+        return ("code", value.co_code, value.co_names, tuple(
+            get_config_fingerprint(const, _seen) for const in value.co_consts))
+    return ("value", type(value).__name__, repr(value))
+
+
+def diff_content_plans(old_plan, new_plan):
+    # Get the changed pages, each with the changed section IDs or None if
+    # the whole page changed, and the pages that were removed
+    changed_pages = {}
+    for path, new_page in new_plan.items():
+        old_page = old_plan.get(path, None)
+        if old_page is None:
+            changed_pages[path] = None
+            continue
+        page_keys = (set(old_page) | set(new_page)) - {"blocks"}
+        if any(get_config_fingerprint(old_page.get(key, None))
+               != get_config_fingerprint(new_page.get(key, None))
+               for key in page_keys):
+            changed_pages[path] = None
+            continue
+        # The page content also changes if sections were removed or moved
+        old_blocks = old_page.get("blocks", None) or {}
+        new_blocks = new_page.get("blocks", None) or {}
+        changed_sections = {
+            section_id for section_id, block in new_blocks.items()
+            if section_id not in old_blocks
+            or get_config_fingerprint(block)
+            != get_config_fingerprint(old_blocks[section_id])}
+        if changed_sections or list(old_blocks) != list(new_blocks):
+            changed_pages[path] = changed_sections
+    removed_pages = [path for path in old_plan if path not in new_plan]
+    return changed_pages, removed_pages
@@ -8,6 +8,9 @@ import copy
 # Third party imports
 import brokkr.utils.misc
 
+# Local imports
+from sindri.config.website import DATETIME_COLNAME
+
 
 DEFAULT_SUBPLOT_NAME = "DEFAULT"
 
@@ -48,3 +51,113 @@ def preprocess_subplots(plot):
         subplot_id: preprocess_subplot_params(plot, subplot_params, subplot_id)
         for subplot_id, subplot_params in subplots.items()}
     return subplots
+
+
+def _get_grouper_columns(grouper):
+    # Columns a groupby key reads; callables and frequency groupers only use
+    # the index, while anything else (e.g. arrays) is unknown
+    if grouper is None or callable(grouper):
+        return set()
+    if isinstance(grouper, str):
+        return {grouper}
+    if isinstance(grouper, (list, tuple)):
+        grouper_cols = set()
+        for grouper_key in grouper:
+            key_cols = _get_grouper_columns(grouper_key)
+            if key_cols is None:
+                return None
+            grouper_cols |= key_cols
+        return grouper_cols
+    if hasattr(grouper, "freq") and hasattr(grouper, "key"):
+        return {grouper.key} if grouper.key is not None else set()
+    return None
+
+
+def get_column_spec_inputs(column_spec):
+    # Columns a calculated column reads, if declared; positional or pattern
+    # access (e.g. iloc or filter) can't be inferred, so otherwise read all
+    colname, after_col, col_function, *spec_options = column_spec
+    if not spec_options or spec_options[0] is None:
+        return None
+    input_cols = set(spec_options[0])
+    if after_col:
+        input_cols.add(after_col)
+    return input_cols
+
+
+def get_tabular_columns(data_args, output_cols=None):
+    if data_args.get("preprocess_fn", None):
+        return None
+    if output_cols is None:
+        output_cols = data_args.get("output_cols", None)
+    if output_cols is None or any(callable(col) for col in output_cols):
+        return None
+    grouper_cols = _get_grouper_columns(data_args.get("file_grouper", None))
+    if grouper_cols is None:
+        return None
+    return {
+        *output_cols,
+        *(data_args.get("col_conversions", None) or {}),
+        *grouper_cols,
+        }
+
+
+def get_dashboard_columns(dashboard_plots, dashboard_subplots=None):
+    required_cols = set()
+    for plot_id, plot in dashboard_plots.items():
+        if dashboard_subplots is None:
+            subplots = preprocess_subplots(plot)
+        else:
+            subplots = dashboard_subplots[plot_id]
+        for subplot_params in subplots.values():
+            if not subplot_params["plot_type"]:
+                continue
+            variable = subplot_params["plot_data"].get("variable", None)
+            if subplot_params["plot_type"] != "numeric" or callable(variable):
+                return None
+            required_cols.add(variable)
+    return required_cols
+
+
+def get_required_columns(
+        content_pages, column_specs=(), datetime_colname=DATETIME_COLNAME):
+    # Columns any page reads from the status data, or None if all might be
+    required_cols = {datetime_colname}
+    for page in content_pages.values():
+        if page["type"] is None:
+            continue
+        # Daily pages write the same processed data for all their blocks
+        if page["type"] == "daily":
+            page_cols = get_tabular_columns(page["args"])
+            if page_cols is None:
+                return None
+            required_cols |= page_cols
+            continue
+
+        for block in page["blocks"].values():
+            if block["type"] in {"generic", "dynamic", "text"}:
+                continue
+            data_args = block["args"]["data_args"]
+            if block["type"] == "dashboard":
+                block_cols = get_dashboard_columns(
+                    data_args["dashboard_plots"],
+                    dashboard_subplots=data_args.get(
+                        "dashboard_subplots", None),
+                    )
+            elif block["type"] == "table":
+                block_cols = get_tabular_columns(data_args)
+            elif block["type"] == "plot":
+                block_cols = get_tabular_columns(
+                    data_args, output_cols=list(data_args["plot_subplots"]))
+            else:
+                return None
+            if block_cols is None:
+                return None
+            required_cols |= block_cols
+
+    for column_spec in column_specs:
+        spec_cols = get_column_spec_inputs(column_spec)
+        if spec_cols is None:
+            return None
+        required_cols |= spec_cols
+    return required_cols
@@ -4,6 +4,9 @@ Code to generate, build and deploy the Mjolnir status website.
 
 # Standard library imports
 import configparser
+import contextlib
+import fnmatch
+import os
 from pathlib import Path
 import shutil
 import subprocess
@@ -13,6 +16,7 @@ import time
 # Local imports
 import sindri.config.website
 import sindri.utils.misc
+import sindri.utils.watch
 import sindri.website.generate
 
 
@@ -26,6 +30,21 @@ LEKTOR_DEFAULT_SERVER_NAME = "mjolnir"
 SOURCE_IGNORE_PATTERNS = (
     "temp", "*.tmp", "*.temp", "*.bak", "*.log", "*.orig", "example-site")
 
+LEKTOR_IN_PROCESS_COMMANDS = {"build", "deploy"}
+# Environment variables the lektor deploy command reads credentials from
+LEKTOR_DEPLOY_CREDENTIAL_VARS = {
+    "username": "LEKTOR_DEPLOY_USERNAME",
+    "password": "LEKTOR_DEPLOY_PASSWORD",
+    "key_file": "LEKTOR_DEPLOY_KEY_FILE",
+    "key": "LEKTOR_DEPLOY_KEY",
+    }
+
+# Project files as of the last full Lektor build, by project path
+_LEKTOR_BUILD_STATES = {}
+
+# Lektor environments kept loaded for in-process builds, by project path
+_LEKTOR_ENVS = {}
+
 
 def get_website_cache_dir(cache_dir=None):
     if cache_dir is None:
@@ -62,20 +81,112 @@ def render_lektorproject(
     return project_config
 
 
-def update_data(project_path=LEKTOR_PROJECT_PATH, mode="test"):
+def update_data(
+        project_path=LEKTOR_PROJECT_PATH, mode="test", changed_dirs=None):
+    # If given, only data from the changed data directories is re-ingested
     sindri.website.generate.generate_site_data(
-        content_pages=sindri.config.website.get_content_config(mode=mode),
+        content_pages=sindri.website.generate.get_content_plan(mode=mode),
         project_path=project_path,
         mode=mode,
+        changed_dirs=changed_dirs,
         )
 
 
 def update_project(project_path=LEKTOR_PROJECT_PATH, mode="test"):
     update_data(project_path=project_path, mode=mode)
     sindri.website.generate.generate_and_write_site_content(
-        content_pages=sindri.config.website.get_content_config(mode=mode),
+        content_pages=sindri.website.generate.get_content_plan(mode=mode),
+        project_path=project_path,
+        )
+
+
+def remove_page_output(page_path, project_path=LEKTOR_PROJECT_PATH,
+                       remaining_paths=()):
+    # Remove a page's content and generated asset (data, plot and compressed)
+    # directories, keeping the subdirectories of any pages nested under it
+    page_path = Path(page_path)
+    keep_subdirs = any(
+        page_path in Path(remaining_path).parents
+        for remaining_path in remaining_paths)
+    for output_path in (
+            project_path / sindri.website.generate.CONTENT_PATH / page_path,
+            project_path / sindri.website.generate.ASSET_PATH / page_path):
+        try:
+            if not keep_subdirs:
+                shutil.rmtree(
+                    output_path, onerror=sindri.utils.misc.force_delete)
+                continue
+            for child_path in output_path.iterdir():
+                if not child_path.is_dir():
+                    child_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def update_changed_content(project_path=LEKTOR_PROJECT_PATH, mode="test"):
+    # Regenerate only the pages and sections whose config has changed
+    old_plan = sindri.website.generate.get_content_plan(mode=mode)
+    if not sindri.config.website.reload_content_config():
+        return False
+    new_plan = sindri.website.generate.get_content_plan(mode=mode)
+    changed_pages, removed_pages = (
+        sindri.website.generate.diff_content_plans(old_plan, new_plan))
+    if not (changed_pages or removed_pages):
+        return False
+
+    project_path = Path(project_path)
+    for path in removed_pages:
+        remove_page_output(
+            path, project_path=project_path, remaining_paths=new_plan.keys())
+
+    # Resetting the lastupdate state makes the next update rewrite the data
+    for path, changed_sections in changed_pages.items():
+        page_blocks = new_plan[path].get("blocks", None) or {}
+        if changed_sections is None:
+            changed_sections = page_blocks.keys()
+        for section_id in changed_sections:
+            sindri.website.generate.reset_lastupdate(
+                project_path / sindri.website.generate.ASSET_PATH / path
+                / page_blocks[section_id]["lastupdate_path"])
+
+    sindri.website.generate.generate_and_write_site_content(
+        content_pages={path: new_plan[path] for path in changed_pages},
         project_path=project_path,
         )
+    print(f"Website config changed; updated pages {list(changed_pages)} "
+          f"and removed pages {removed_pages}")
+    return True
+
+
+def get_data_dirs(mode="test"):
+    if mode == "server":
+        return [
+            (Path(sindri.config.website.DATA_DIR_SERVER) / unit_dir
+             / sindri.config.website.DATA_SUBDIR_SERVER)
+            for unit_dir in sindri.config.website.UNIT_DIRS_SERVER]
+    return [Path(sindri.config.website.DATA_DIR_CLIENT)]
+
+
+def copy_output_tree(
+        source_path, output_path, ignore_patterns=None, link=None):
+    if not sindri.config.website.SYNC_OUTPUT:
+        sindri.utils.misc.copytree(
+            source_path, output_path, ignore_patterns=ignore_patterns)
+        return None
+    sync_stats = sindri.utils.misc.synctree(
+        source_path,
+        output_path,
+        ignore_patterns=ignore_patterns,
+        compare_hash=sindri.config.website.SYNC_COMPARE_HASH,
+        link=link,
+        delete=sindri.config.website.SYNC_DELETE,
+        max_workers=sindri.config.website.SYNC_WORKERS,
+        )
+    print(f"Synced {output_path}: {sync_stats['files_copied']} files copied "
+          f"({sync_stats['bytes_copied']} bytes), "
+          f"{sync_stats['files_skipped']} unchanged, "
+          f"{sync_stats['files_deleted']} deleted")
+    return sync_stats
 
 
 def rebuild_project(
@@ -83,11 +194,17 @@ def rebuild_project(
         output_path=LEKTOR_PROJECT_PATH,
         mode=None,
         ):
-    try:
-        shutil.rmtree(output_path, onerror=sindri.utils.misc.force_delete)
-    except Exception:
-        pass
-    sindri.utils.misc.copytree(
+    # Syncing keeps unchanged files as they are, so Lektor doesn't have to
+    # rebuild them, and deletes stale ones only if SYNC_DELETE is set.
+    # Files here are written in place, so they are always copied, not linked.
+    if not sindri.config.website.SYNC_OUTPUT:
+        try:
+            shutil.rmtree(output_path, onerror=sindri.utils.misc.force_delete)
+        except Exception:
+            pass
+    sindri.website.generate.reset_lastupdate()
+    _LEKTOR_ENVS.pop(Path(output_path).resolve(), None)
+    copy_output_tree(
         source_path, output_path, ignore_patterns=SOURCE_IGNORE_PATTERNS)
 
     lektorproject_config = render_lektorproject(project_path=output_path)
@@ -98,7 +215,101 @@ def rebuild_project(
     update_project(project_path=output_path, mode=mode)
 
 
+def get_lektor_env(project_path=LEKTOR_PROJECT_PATH):
+    # Keep the project, plugins and templates loaded between builds
+    project_path = Path(project_path).resolve()
+    lektor_env = _LEKTOR_ENVS.get(project_path, None)
+    if lektor_env is None:
+        import lektor.project
+        project = lektor.project.Project.from_path(str(project_path))
+        if project is None:
+            raise ValueError(f"No Lektor project found in {project_path}")
+        lektor_env = project.make_env(load_plugins=True)
+        _LEKTOR_ENVS[project_path] = lektor_env
+    return lektor_env
+
+
+def run_lektor_in_process(
+        command, project_path=LEKTOR_PROJECT_PATH, verbose=1):
+    lektor_env = get_lektor_env(project_path)
+    output_path = get_lektor_output_path(project_path)
+    original_cwd = os.getcwd()
+    try:
+        os.chdir(project_path)
+        if command == "build":
+            import lektor.builder
+            import lektor.reporter
+            # Lektor's build state on disk lets it skip unchanged artifacts
+            builder = lektor.builder.Builder(
+                lektor_env.new_pad(), str(output_path))
+            reporter = contextlib.ExitStack()
+            if verbose >= 1:
+                reporter = lektor.reporter.CliReporter(
+                    lektor_env, verbosity=verbose - 1)
+            with reporter:
+                n_failures = builder.build_all()
+                builder.prune()
+            if n_failures:
+                raise RuntimeError(
+                    f"Lektor build failed for {n_failures} artifacts")
+        elif command == "deploy":
+            import lektor.publisher
+            server_info = lektor_env.load_config().get_default_server()
+            if server_info is None:
+                raise ValueError("No default Lektor server configured")
+            for line in lektor.publisher.publish(
+                    lektor_env,
+                    server_info.target,
+                    str(output_path),
+                    credentials={
+                        key: os.environ.get(env_var, None)
+                        for key, env_var
+                        in LEKTOR_DEPLOY_CREDENTIAL_VARS.items()},
+                    server_info=server_info,
+                    ):
+                if verbose >= 1:
+                    print(f"  {line}")
+        else:
+            raise ValueError(
+                "In-process Lektor command must be one of "
+                f"{LEKTOR_IN_PROCESS_COMMANDS}, not {command!r}")
+    finally:
+        os.chdir(original_cwd)
+
+
+def get_lektor_output_path(project_path=LEKTOR_PROJECT_PATH):
+    if sindri.config.website.LEKTOR_IN_PROCESS:
+        output_path = os.environ.get("LEKTOR_OUTPUT_PATH", None)
+        try:
+            if output_path is None:
+                output_path = get_lektor_env(
+                    project_path).project.get_output_path()
+            return Path(output_path)
+        except Exception as error:
+            print("Error getting Lektor output path in-process; "
+                  "retrying in a subprocess")
+            print(f"{type(error).__name__}: {error}")
+    build_dir_output = run_lektor(
+        "project-info",
+        args=["--output-path"],
+        project_path=project_path,
+        verbose=0,
+        )
+    return Path(build_dir_output.stdout.decode().strip())
+
+
 def run_lektor(command, args=(), project_path=LEKTOR_PROJECT_PATH, verbose=1):
+    if (sindri.config.website.LEKTOR_IN_PROCESS and not args
+            and command in LEKTOR_IN_PROCESS_COMMANDS):
+        try:
+            return run_lektor_in_process(
+                command, project_path=project_path, verbose=verbose)
+        except Exception as error:
+            print(f"Error running Lektor {command} in-process; "
+                  "retrying in a subprocess")
+            print(f"{type(error).__name__}: {error}")
+            _LEKTOR_ENVS.pop(Path(project_path).resolve(), None)
+
     extra_args = {}
     lektor_call = [sys.executable, "-m", "lektor", command, *args]
     if verbose <= 0:
@@ -114,19 +325,100 @@ def run_lektor(command, args=(), project_path=LEKTOR_PROJECT_PATH, verbose=1):
             lektor_call, check=True, cwd=project_path, **extra_args)
 
 
+def build_lektor(cache_dir, dest_dir=None, verbose=0):
+    project_files = get_project_files(cache_dir)
+    run_lektor(command="build", project_path=cache_dir, verbose=verbose + 1)
+    if dest_dir or sindri.config.website.BUILD_DATA_FAST_PATH:
+        build_dir = get_lektor_output_path(cache_dir)
+        if dest_dir:
+            copy_output_tree(
+                build_dir, dest_dir, link=sindri.config.website.SYNC_LINK)
+        _LEKTOR_BUILD_STATES[Path(cache_dir)] = {
+            "source_files": project_files[0],
+            "asset_files": project_files[1],
+            "build_dir": build_dir,
+            }
+
+
+def get_project_files(project_path, ignore_patterns=SOURCE_IGNORE_PATTERNS):
+    # Map each file's path to its mtime and size, split into assets and the
+    # rest (contents, templates, themes, etc) that need Lektor to build
+    asset_dir = str(sindri.website.generate.ASSET_PATH)
+    source_files = {}
+    asset_files = {}
+    dirs_to_scan = [Path(project_path)]
+    while dirs_to_scan:
+        with os.scandir(dirs_to_scan.pop()) as entries:
+            for entry in entries:
+                if any(fnmatch.fnmatch(entry.name, pattern)
+                       for pattern in ignore_patterns):
+                    continue
+                if entry.is_dir():
+                    dirs_to_scan.append(Path(entry.path))
+                    continue
+                file_path = Path(entry.path).relative_to(project_path)
+                entry_stat = entry.stat()
+                file_info = (entry_stat.st_mtime_ns, entry_stat.st_size)
+                if file_path.parts[0] == asset_dir:
+                    asset_files[file_path] = file_info
+                else:
+                    source_files[file_path] = file_info
+    return source_files, asset_files
+
+
+def copy_changed_data(cache_dir, dest_dir=None):
+    # If only assets changed since the last build, copy them straight to the
+    # build output; returns False if a full Lektor build is needed instead
+    build_state = _LEKTOR_BUILD_STATES.get(Path(cache_dir), None)
+    if build_state is None:
+        return False
+    source_files, asset_files = get_project_files(cache_dir)
+    if source_files != build_state["source_files"]:
+        return False
+
+    changed_files = [
+        file_path for file_path, file_info in asset_files.items()
+        if build_state["asset_files"].get(file_path, None) != file_info]
+    removed_files = [
+        file_path for file_path in build_state["asset_files"]
+        if file_path not in asset_files]
+    output_dirs = [build_state["build_dir"]]
+    if dest_dir:
+        output_dirs.append(Path(dest_dir))
+    for output_dir in output_dirs:
+        for file_path in changed_files:
+            source_path = Path(cache_dir) / file_path
+            output_path = output_dir / file_path.relative_to(
+                sindri.website.generate.ASSET_PATH)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                output_stat = output_path.stat()
+            except FileNotFoundError:
+                output_stat = None
+            # Replaces the file atomically, skipping it if it's unchanged
+            sindri.utils.misc.sync_file(
+                source_path,
+                output_path,
+                source_path.stat(),
+                output_stat,
+                compare_hash=sindri.config.website.SYNC_COMPARE_HASH,
+                )
+        for file_path in removed_files:
+            try:
+                (output_dir / file_path.relative_to(
+                    sindri.website.generate.ASSET_PATH)).unlink()
+            except FileNotFoundError:
+                pass
+    build_state["asset_files"] = asset_files
+    return True
+
+
 def build_deploy_lektor(mode, cache_dir, dest_dir=None, verbose=0):
     if mode == "server" and dest_dir is None:
         dest_dir = sindri.config.website.OUTPUT_DIR_SERVER
-    run_lektor(command="build", project_path=cache_dir, verbose=verbose + 1)
-    if dest_dir:
-        build_dir_output = run_lektor(
-            "project-info",
-            args=["--output-path"],
-            project_path=cache_dir,
-            verbose=0,
-            )
-        build_dir = Path(build_dir_output.stdout.decode().strip())
-        sindri.utils.misc.copytree(build_dir, dest_dir)
+    if not (sindri.config.website.BUILD_DATA_FAST_PATH
+            and copy_changed_data(cache_dir, dest_dir=dest_dir)):
+        build_lektor(cache_dir, dest_dir=dest_dir, verbose=verbose)
     if mode == "client":
         run_lektor(command="deploy", project_path=cache_dir, verbose=verbose)
 
@@ -179,14 +471,44 @@ def start_serving_website(
         verbose=verbose,
         )
 
+    # Update as soon as data changes, with the interval as the maximum delay
+    watcher = None
+    if sindri.config.website.WATCH_DATA_DIRS:
+        watcher = sindri.utils.watch.get_directory_watcher(
+            get_data_dirs(mode=mode),
+            poll_interval_s=sindri.config.website.WATCH_POLL_INTERVAL_S,
+            )
+
     try:
         # Initial 60 s wait to ensure site fully builds once before rerunning
         if mode == "test":
             for __ in range(58):
                 time.sleep(1)
         while True:
-            sindri.utils.misc.delay_until_desired_time(update_interval_s)
-            update_data(project_path=cache_dir, mode=mode)
+            changed_dirs = None
+            if watcher is None:
+                sindri.utils.misc.delay_until_desired_time(update_interval_s)
+            else:
+                changed_dirs = sindri.utils.watch.wait_for_changes(
+                    watcher,
+                    timeout_s=update_interval_s,
+                    debounce_s=sindri.config.website.WATCH_DEBOUNCE_S,
+                    )
+                if changed_dirs and verbose >= 1:
+                    print("Data changed in "
+                          f"{sorted(str(path) for path in changed_dirs)}")
+                # Re-ingest everything periodically, and while any directory
+                # isn't watched, so nothing can stay stale
+                if not changed_dirs or watcher.unwatched_dirs:
+                    changed_dirs = None
+            if sindri.config.website.WATCH_WEBSITE_CONFIG:
+                try:
+                    update_changed_content(project_path=cache_dir, mode=mode)
+                except Exception as error:
+                    print("Error applying changes to the website config")
+                    print(f"{type(error).__name__}: {error}")
+            update_data(
+                project_path=cache_dir, mode=mode, changed_dirs=changed_dirs)
             if mode in {"client", "server"}:
                 build_deploy_lektor(
                     mode=mode,
@@ -196,3 +518,6 @@ def start_serving_website(
                     )
     except KeyboardInterrupt:
         print("Keyboard interrupt recieved; exiting.")
+    finally:
+        if watcher is not None:
+            watcher.close()
@@ -482,6 +482,9 @@ var plotConfig_{section_id} = {{
 }};
 
 var lastUpdate_{section_id} = null;
+var plotData_{section_id} = null;
+var deltaBase_{section_id} = null;
+var deltaSequence_{section_id} = 0;
 
 var subplots_{section_id} = [
     {sub_plots}
@@ -527,6 +530,67 @@ function unpack(data, key) {{
     return data[key];
 }};
 
+var columnarBinaryArrays = {{
+    float32: Float32Array,
+    int32: Int32Array,
+    int64: BigInt64Array,
+}};
+
+function decodeColumnarBinary(buffer) {{
+    var magic = String.fromCharCode.apply(null, new Uint8Array(buffer, 0, 4));
+    if (magic != "SDC1") {{
+        throw new Error("Unrecognized binary data format");
+    }};
+    var headerLength = new DataView(buffer).getUint32(4, true);
+    var header = JSON.parse(new TextDecoder("utf-8").decode(
+        new Uint8Array(buffer, 8, headerLength)));
+    var data = {{}};
+    header.columns.forEach(function(column) {{
+        var values = new columnarBinaryArrays[column.dtype](
+            buffer, column.offset, header.n_rows);
+        if (column.encoding == "time") {{
+            var times = new Array(header.n_rows);
+            var time = column.start || 0;
+            for (let i = 0; i < header.n_rows; i++) {{
+                if (column.delta) {{
+                    time += Number(values[i]);
+                }} else {{
+                    time = Number(values[i]);
+                }};
+                times[i] = time * column.unit_ms;
+            }};
+            values = times;
+        }} else if (column.dtype == "int64") {{
+            values = Float64Array.from(values, Number);
+        }};
+        data[column.name] = values;
+    }});
+    return data;
+}};
+
+function loadColumnarBinary(dataPath, callback) {{
+    var xhrData = new XMLHttpRequest();
+    xhrData.open("GET", dataPath, true);
+    xhrData.responseType = "arraybuffer";
+    xhrData.onload = function() {{
+        if (this.status >= 300 || this.status < 200) {{
+            callback(this.status, null);
+            return;
+        }};
+        try {{
+            var data = decodeColumnarBinary(this.response);
+        }} catch (error) {{
+            callback(error, null);
+            return;
+        }};
+        callback(null, data);
+    }};
+    xhrData.onerror = function() {{
+        callback(this.status, null);
+    }};
+    xhrData.send();
+}};
+
 function createSubplots(plotid, subplotList, data) {{
     for (let i = 0; i < subplotList.length; i++) {{
         subplotList[i].x = unpack(data, "{x_variable}");
@@ -544,10 +608,86 @@ function updateSubplots(plotid, subplotList, data) {{
     }};
 }};
 
+function concatColumn(oldValues, newValues) {{
+    if (oldValues.constructor === Array) {{
+        return oldValues.concat(Array.from(newValues));
+    }};
+    var values = new oldValues.constructor(oldValues.length + newValues.length);
+    values.set(oldValues);
+    values.set(newValues, oldValues.length);
+    return values;
+}};
+
+function trimToWindow(data, xVariable, windowMs) {{
+    var xValues = data[xVariable];
+    if (! windowMs || ! xValues || ! xValues.length) {{
+        return data;
+    }};
+    var toTime = function(value) {{
+        return typeof value == "number" ? value : Date.parse(value);
+    }};
+    var cutoff = toTime(xValues[xValues.length - 1]) - windowMs;
+    var startIdx = 0;
+    while (startIdx < xValues.length && toTime(xValues[startIdx]) <= cutoff) {{
+        startIdx++;
+    }};
+    if (startIdx > 0) {{
+        Object.keys(data).forEach(function(key) {{
+            data[key] = data[key].slice(startIdx);
+        }});
+    }};
+    return data;
+}};
+
+function updateDelta_{section_id}(lastUpdateData) {{
+    var base = lastUpdateData.deltaBase;
+    var sequence = 0;
+    if (plotData_{section_id} != null && deltaBase_{section_id} == base) {{
+        if (deltaSequence_{section_id} >= lastUpdateData.deltaSequence) {{
+            return;
+        }};
+        sequence = deltaSequence_{section_id} + 1;
+    }};
+    var deltaPath = "{delta_path}";
+    {delta_loader}(deltaPath, function(error, data) {{
+        // Start again from the base if a chunk was removed by compaction
+        if (error || ! data) {{
+            plotData_{section_id} = null;
+            return;
+        }};
+        if (sequence == 0) {{
+            plotData_{section_id} = {{}};
+            Object.keys(data).forEach(function(key) {{
+                plotData_{section_id}[key] = unpack(data, key);
+            }});
+        }} else if (deltaBase_{section_id} != base || deltaSequence_{section_id} != sequence - 1) {{
+            return;
+        }} else {{
+            Object.keys(plotData_{section_id}).forEach(function(key) {{
+                plotData_{section_id}[key] = concatColumn(
+                    plotData_{section_id}[key], unpack(data, key));
+            }});
+        }};
+        deltaBase_{section_id} = base;
+        deltaSequence_{section_id} = sequence;
+        if (sequence < lastUpdateData.deltaSequence) {{
+            updateDelta_{section_id}(lastUpdateData);
+            return;
+        }};
+        plotData_{section_id} = trimToWindow(
+            plotData_{section_id}, "{x_variable}", lastUpdateData.deltaWindow);
+        createSubplots("{section_id}-output", subplots_{section_id}, plotData_{section_id});
+    }});
+}};
+
 var xhrCheck_{section_id} = new XMLHttpRequest();
 xhrCheck_{section_id}.onreadystatechange = function() {{
     if (this.readyState == XMLHttpRequest.DONE && this.status < 300 && this.status >= 200) {{
         var lastUpdateData = JSON.parse(this.responseText);
+        if (lastUpdateData.deltaBase != null && ! enableQueryParsing) {{
+            updateDelta_{section_id}(lastUpdateData);
+            return;
+        }};
         var currentUpdate = new Date(lastUpdateData.lastUpdate);
         if (lastUpdate_{section_id} == null || lastUpdate_{section_id}.getTime() != currentUpdate.getTime()) {{
             lastUpdate_{section_id} = currentUpdate;
@@ -560,7 +700,7 @@ xhrCheck_{section_id}.onreadystatechange = function() {{
                 extraPathText = dataPath;
             }};
 
-            Plotly.d3.{extension}(dataPath, function(error, data) {{
+            {data_loader}(dataPath, function(error, data) {{
                 if ({alert_on_fail} && (error || ! data || data.length < 2 ||  Object.values(Plotly.d3.values(data)[0])[0] == "")) {{
                     window.alert("Data for " + extraPathText + " not available.");
                     return;